@@ -1,24 +1,121 @@
-from flask import Flask, render_template, request, jsonify
+import json
+import time
+from typing import Optional
+from flask import Flask, render_template, request, jsonify, g
 from flask_cors import CORS
+from backend.discussion import DiscussionError, parse_discussion_options, parse_discussion_rounds
+from backend.history import MAX_PAGE_SIZE
+from backend.jobs import JobError, create_job_queue, parse_job_request
+from backend.metrics import SSE_STREAM_SECONDS, SSE_STREAMS_ACTIVE, registry
 from backend.orchestrator import Orchestrator
+from backend.sessions import Session, SessionStore
+from backend.startup import startup
+from backend.streams import EventStream, create_stream_registry
+from backend.tracing import Trace
 
 app = Flask(__name__,
             template_folder='frontend/templates',
             static_folder='frontend/static')
-CORS(app)
-
-orchestrator = Orchestrator()
+CORS(app, expose_headers=['X-Session-Id', 'X-Run-Id'])
+
+with startup.phase("orchestrator"):
+    orchestrator = Orchestrator()
+sessions = SessionStore(
+    orchestrator.spawn,
+    max_sessions=orchestrator.config.get_int('SESSION_MAX', 500),
+    ttl_seconds=orchestrator.config.get_float('SESSION_TTL_SECONDS', 3600),
+    state=orchestrator.state,
+    lease_seconds=orchestrator.config.get_float('SESSION_LEASE_SECONDS', 900)
+)
+jobs = create_job_queue(orchestrator.config, orchestrator.spawn)
+streams = create_stream_registry(orchestrator.config)
+startup.ready()
+
+def get_session() -> Session:
+    session_id = request.headers.get('X-Session-Id') or request.args.get('session_id')
+    if not session_id and request.is_json:
+        session_id = (request.get_json(silent=True) or {}).get('session_id')
+    if session_id and not SessionStore.is_valid_id(session_id):
+        session_id = None
+
+    g.session = sessions.get(session_id)
+    return g.session
+
+def session_busy(session: Session):
+    return jsonify({
+        "success": False,
+        "error": "Session is busy with another workflow",
+        "session_id": session.id
+    }), 409
+
+def sse_event(payload: dict, event_id: Optional[int] = None) -> str:
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+@app.after_request
+def add_session_header(response):
+    if 'session' in g:
+        response.headers['X-Session-Id'] = g.session.id
+    return response
+
+def unknown_workflow(session: Session, name: str):
+    return jsonify({
+        "success": False,
+        "error": f"Unknown workflow '{name}'. Available workflows: {list(session.orchestrator.workflows)}",
+        "session_id": session.id
+    }), 400
+
+def stream_metrics(workflow: str, events):
+    started = time.perf_counter()
+    SSE_STREAMS_ACTIVE.inc(workflow=workflow)
+    try:
+        yield from events
+    finally:
+        SSE_STREAMS_ACTIVE.dec(workflow=workflow)
+        SSE_STREAM_SECONDS.observe(time.perf_counter() - started, workflow=workflow)
+
+def follow_stream(stream: EventStream, last_event_id: int = 0):
+    for item in stream.follow(last_event_id):
+        if item is None:
+            yield ": keepalive\n\n"
+        else:
+            yield sse_event(item[1], item[0])
+
+def stream_response(stream: EventStream, last_event_id: int = 0):
+    response = app.response_class(stream_metrics(stream.name, follow_stream(stream, last_event_id)),
+                                  mimetype='text/event-stream')
+    response.headers['X-Run-Id'] = stream.id
+    return response
+
+def session_busy_stream(session: Session):
+    active = streams.active(session.id)
+
+    def generate():
+        yield sse_event({'type': 'error', 'agent': 'System', 'error': 'Session is busy with another workflow',
+                         'run_id': active.id if active else None})
+        yield sse_event({'type': 'complete'})
+
+    return app.response_class(generate(), mimetype='text/event-stream')
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return app.response_class(registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/status', methods=['GET'])
 def get_status():
     try:
-        status = orchestrator.get_status()
+        session = get_session()
+        status = session.orchestrator.get_status()
+        status["active_sessions"] = len(sessions)
+        status["queued_jobs"] = jobs.queued()
+        status["startup"] = startup.to_dict()
         return jsonify({
             "success": True,
+            "session_id": session.id,
             "data": status
         })
     except Exception as e:
@@ -30,9 +127,11 @@ def get_status():
 @app.route('/api/agents', methods=['GET'])
 def get_agents():
     try:
-        agents = orchestrator.get_available_agents()
+        session = get_session()
+        agents = session.orchestrator.get_available_agents()
         return jsonify({
             "success": True,
+            "session_id": session.id,
             "agents": agents
         })
     except Exception as e:
@@ -41,6 +140,21 @@ def get_agents():
             "error": str(e)
         }), 500
 
+@app.route('/api/workflows', methods=['GET'])
+def get_workflows():
+    try:
+        session = get_session()
+        return jsonify({
+            "success": True,
+            "session_id": session.id,
+            "workflows": [workflow.to_dict() for workflow in session.orchestrator.workflows.values()]
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
 @app.route('/api/call-agent', methods=['POST'])
 def call_agent():
     try:
@@ -54,7 +168,17 @@ def call_agent():
                 "error": "Missing 'agent' or 'prompt' in request"
             }), 400
 
-        result = orchestrator.call_agent(agent_name, prompt)
+        session = get_session()
+        if not session.lock.acquire(blocking=False):
+            return session_busy(session)
+        try:
+            session.orchestrator.begin_run()
+            result = session.orchestrator.call_agent(agent_name, prompt)
+        finally:
+            session.lock.release()
+            session.touch()
+
+        result["session_id"] = session.id
         return jsonify(result)
 
     except Exception as e:
@@ -75,11 +199,26 @@ def run_sequential_workflow():
                 "error": "Missing 'request' in request body"
             }), 400
 
-        results = orchestrator.run_sequential_workflow(user_request)
+        session = get_session()
+        workflow = session.orchestrator.get_workflow(data.get('workflow'))
+        if workflow is None:
+            return unknown_workflow(session, data.get('workflow'))
+
+        if not session.lock.acquire(blocking=False):
+            return session_busy(session)
+        try:
+            session.orchestrator.begin_run()
+            results = session.orchestrator.run_workflow(workflow, user_request)
+        finally:
+            session.lock.release()
+            session.touch()
+
         return jsonify({
             "success": True,
+            "session_id": session.id,
             "workflow": results,
-            "conversation": orchestrator.get_conversation_history()
+            "cancelled": session.orchestrator.cancelled,
+            "last_seq": session.orchestrator.last_seq()
         })
 
     except Exception as e:
@@ -100,41 +239,40 @@ def run_sequential_workflow_stream():
                 "error": "Missing 'request' in request body"
             }), 400
 
-        def generate():
-            import json
-            import time
-
-            yield f"data: {json.dumps({'type': 'start', 'message': 'Starting workflow...'})}\n\n"
-            time.sleep(0.1)
+        session = get_session()
+        session_orchestrator = session.orchestrator
+        workflow = session_orchestrator.get_workflow(data.get('workflow'))
+        if workflow is None:
+            return unknown_workflow(session, data.get('workflow'))
 
-            orchestrator.add_message("User", user_request)
-            yield f"data: {json.dumps({'type': 'message', 'agent': 'User', 'role': 'User', 'message': user_request})}\n\n"
+        if not session.lock.acquire(blocking=False):
+            return session_busy_stream(session)
+        cancel_token = session_orchestrator.begin_run()
 
-            agent_sequence = [
-                ("chatgpt", f"As a Product Manager, analyze this request and create a detailed technical specification with key features and tech stack recommendations: {user_request}"),
-                ("gemini", "As a Full-Stack Developer, based on the specification above, write actual code snippets for the key components. Include both frontend (HTML/JS) and backend (Python/Node.js) code. Keep each code block concise but functional."),
-                ("groq", "As a QA Engineer, review the specification and code above. Suggest test cases, potential bugs to watch for, and quality improvements. Provide examples of unit tests if applicable.")
-            ]
+        def generate(stream: EventStream):
+            trace = Trace(workflow.name)
+            try:
+                yield {'type': 'start', 'message': 'Starting workflow...', 'session_id': session.id, 'run_id': stream.id}
+                time.sleep(0.1)
 
-            for agent_name, task in agent_sequence:
-                if agent_name in orchestrator.agents:
-                    agent = orchestrator.agents[agent_name]
-                    yield f"data: {json.dumps({'type': 'thinking', 'agent': agent_name, 'role': agent.role})}\n\n"
+                session_orchestrator.add_message("User", user_request)
+                yield {'type': 'message', 'agent': 'User', 'role': 'User', 'message': user_request}
 
-                    result = orchestrator.call_agent(agent_name, task)
+                yield from session_orchestrator.stream_workflow(workflow, user_request, trace)
 
-                    if result['success']:
-                        yield f"data: {json.dumps({'type': 'message', 'agent': agent_name, 'role': result['role'], 'message': result['response']})}\n\n"
-                    else:
-                        yield f"data: {json.dumps({'type': 'error', 'agent': agent_name, 'error': result.get('error', 'Unknown error')})}\n\n"
+                if cancel_token.cancelled:
+                    yield {'type': 'cancelled', 'agent': 'System', 'message': 'Workflow cancelled'}
+                else:
+                    agent_count = len([name for name in workflow.agents() if name in session_orchestrator.agents])
+                    completion_summary = f"✅ Build complete! All {agent_count} agents have finished their work on: '{user_request}'"
+                    yield {'type': 'message', 'agent': 'System', 'role': 'Orchestrator', 'message': completion_summary}
 
-            agent_count = len([name for name in ['chatgpt', 'gemini', 'groq'] if name in orchestrator.agents])
-            completion_summary = f"✅ Build complete! All {agent_count} agents have finished their work on: '{user_request}'"
-            yield f"data: {json.dumps({'type': 'message', 'agent': 'System', 'role': 'Orchestrator', 'message': completion_summary})}\n\n"
+                yield {'type': 'complete', 'trace': trace.to_dict()}
+            finally:
+                session.lock.release()
+                session.touch()
 
-            yield f"data: {json.dumps({'type': 'complete'})}\n\n"
-
-        return app.response_class(generate(), mimetype='text/event-stream')
+        return stream_response(streams.start(session.id, workflow.name, generate, cancel_token))
 
     except Exception as e:
         return jsonify({
@@ -147,19 +285,37 @@ def run_discussion():
     try:
         data = request.json
         topic = data.get('topic')
-        rounds = data.get('rounds', 2)
 
         if not topic:
             return jsonify({
                 "success": False,
                 "error": "Missing 'topic' in request body"
             }), 400
+        try:
+            rounds = parse_discussion_rounds(data)
+            options = parse_discussion_options(data)
+        except DiscussionError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+
+        session = get_session()
+        if not session.lock.acquire(blocking=False):
+            return session_busy(session)
+        try:
+            session.orchestrator.begin_run()
+            results = session.orchestrator.run_round_robin_discussion(topic, rounds, options)
+        finally:
+            session.lock.release()
+            session.touch()
 
-        results = orchestrator.run_round_robin_discussion(topic, rounds)
         return jsonify({
             "success": True,
+            "session_id": session.id,
             "discussion": results,
-            "conversation": orchestrator.get_conversation_history()
+            "cancelled": session.orchestrator.cancelled,
+            "last_seq": session.orchestrator.last_seq()
         })
 
     except Exception as e:
@@ -173,50 +329,253 @@ def run_discussion_stream():
     try:
         data = request.json
         topic = data.get('topic')
-        rounds = data.get('rounds', 2)
 
         if not topic:
             return jsonify({
                 "success": False,
                 "error": "Missing 'topic' in request body"
             }), 400
+        try:
+            rounds = parse_discussion_rounds(data)
+            options = parse_discussion_options(data)
+        except DiscussionError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
 
-        def generate():
-            import json
-            import time
+        session = get_session()
+        session_orchestrator = session.orchestrator
+
+        if not session.lock.acquire(blocking=False):
+            return session_busy_stream(session)
+        cancel_token = session_orchestrator.begin_run()
+
+        def generate(stream: EventStream):
+            trace = Trace('discussion')
+            try:
+                yield {'type': 'start', 'message': 'Starting discussion...', 'session_id': session.id, 'run_id': stream.id}
+                time.sleep(0.1)
+
+                session_orchestrator.add_message("User", f"Discussion topic: {topic}")
+                yield {'type': 'message', 'agent': 'User', 'role': 'User', 'message': f'Discussion topic: {topic}'}
+
+                available = session_orchestrator.get_available_agents()
+
+                rounds_run = 0
+                for event in session_orchestrator.stream_discussion(topic, rounds, trace, options):
+                    rounds_run = max(rounds_run, event.get('round', 0))
+                    yield event
+
+                if cancel_token.cancelled:
+                    yield {'type': 'cancelled', 'agent': 'System', 'message': 'Discussion cancelled'}
+                else:
+                    completion_summary = f"✅ Discussion complete! {len(available)} agents discussed '{topic}' over {rounds_run} rounds."
+                    yield {'type': 'message', 'agent': 'System', 'role': 'Orchestrator', 'message': completion_summary}
+
+                yield {'type': 'complete', 'trace': trace.to_dict()}
+            finally:
+                session.lock.release()
+                session.touch()
+
+        return stream_response(streams.start(session.id, 'discussion', generate, cancel_token))
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+def run_not_found(session: Session, run_id: str):
+    return jsonify({
+        "success": False,
+        "error": f"Run '{run_id}' not found",
+        "session_id": session.id
+    }), 404
+
+@app.route('/api/runs', methods=['GET'])
+def list_runs():
+    try:
+        session = get_session()
+        return jsonify({
+            "success": True,
+            "session_id": session.id,
+            "runs": [stream.to_dict() for stream in list(streams.streams.values()) if stream.session_id == session.id]
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/runs/<run_id>/events', methods=['GET'])
+def stream_run_events(run_id):
+    try:
+        session = get_session()
+        stream = streams.get(run_id, session.id)
+        if stream is None:
+            return run_not_found(session, run_id)
+
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0
+        try:
+            last_event_id = int(last_event_id)
+        except ValueError:
+            last_event_id = 0
+
+        return stream_response(stream, last_event_id)
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/runs/<run_id>/cancel', methods=['POST'])
+def cancel_run(run_id):
+    try:
+        session = get_session()
+        stream = streams.get(run_id, session.id)
+        if stream is None:
+            return run_not_found(session, run_id)
+
+        stream.cancel()
+        return jsonify({
+            "success": True,
+            "session_id": session.id,
+            "run": stream.to_dict()
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/cancel', methods=['POST'])
+def cancel():
+    try:
+        session = get_session()
+        busy = session.busy
+        session.orchestrator.cancel()
+        return jsonify({
+            "success": True,
+            "session_id": session.id,
+            "cancelled": busy
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
 
-            yield f"data: {json.dumps({'type': 'start', 'message': 'Starting discussion...'})}\n\n"
-            time.sleep(0.1)
+def job_not_found(session: Session, job_id: str):
+    return jsonify({
+        "success": False,
+        "error": f"Job '{job_id}' not found",
+        "session_id": session.id
+    }), 404
 
-            orchestrator.add_message("User", f"Discussion topic: {topic}")
-            yield f"data: {json.dumps({'type': 'message', 'agent': 'User', 'role': 'User', 'message': f'Discussion topic: {topic}'})}\n\n"
+@app.route('/api/jobs', methods=['POST'])
+def submit_jobs():
+    try:
+        data = request.json or {}
+        session = get_session()
+        requests_data = data.get('jobs') if 'jobs' in data else [data]
+        if not isinstance(requests_data, list) or not requests_data:
+            return jsonify({
+                "success": False,
+                "error": "'jobs' must be a non-empty list",
+                "session_id": session.id
+            }), 400
 
-            available = orchestrator.get_available_agents()
+        try:
+            specs = [parse_job_request(item, session.orchestrator) for item in requests_data]
+            submitted = jobs.submit_many(specs, session.id)
+        except JobError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e),
+                "session_id": session.id
+            }), 400
 
-            for round_num in range(rounds):
-                for agent_name in available:
-                    agent = orchestrator.agents[agent_name]
-                    yield f"data: {json.dumps({'type': 'thinking', 'agent': agent_name, 'role': agent.role})}\n\n"
+        return jsonify({
+            "success": True,
+            "session_id": session.id,
+            "jobs": [job.to_dict(include_results=False) for job in submitted]
+        }), 202
 
-                    if round_num == 0:
-                        prompt = f"Share your perspective on: {topic}"
-                    else:
-                        prompt = f"Respond to the previous comments and add your thoughts on round {round_num + 1}."
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    try:
+        session = get_session()
+        return jsonify({
+            "success": True,
+            "session_id": session.id,
+            "jobs": [job.to_dict(include_results=False) for job in jobs.list(session.id)]
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
 
-                    result = orchestrator.call_agent(agent_name, prompt)
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    try:
+        session = get_session()
+        job = jobs.get(job_id, session.id)
+        if job is None:
+            return job_not_found(session, job_id)
+
+        return jsonify({
+            "success": True,
+            "session_id": session.id,
+            "job": job.to_dict()
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
 
-                    if result['success']:
-                        yield f"data: {json.dumps({'type': 'message', 'agent': agent_name, 'role': result['role'], 'message': result['response']})}\n\n"
-                    else:
-                        yield f"data: {json.dumps({'type': 'error', 'agent': agent_name, 'error': result.get('error', 'Unknown error')})}\n\n"
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    try:
+        session = get_session()
+        job = jobs.get(job_id, session.id)
+        if job is None:
+            return job_not_found(session, job_id)
 
-            completion_summary = f"✅ Discussion complete! {len(available)} agents discussed '{topic}' over {rounds} rounds."
-            yield f"data: {json.dumps({'type': 'message', 'agent': 'System', 'role': 'Orchestrator', 'message': completion_summary})}\n\n"
+        since = request.args.get('since', 0, type=int)
 
-            yield f"data: {json.dumps({'type': 'complete'})}\n\n"
+        def generate():
+            for event in job.follow(since):
+                yield ": keepalive\n\n" if event is None else sse_event(event)
 
         return app.response_class(generate(), mimetype='text/event-stream')
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
 
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    try:
+        session = get_session()
+        job = jobs.cancel(job_id, session.id)
+        if job is None:
+            return job_not_found(session, job_id)
+
+        return jsonify({
+            "success": True,
+            "session_id": session.id,
+            "job": job.to_dict(include_results=False)
+        })
     except Exception as e:
         return jsonify({
             "success": False,
@@ -226,10 +585,21 @@ def run_discussion_stream():
 @app.route('/api/conversation', methods=['GET'])
 def get_conversation():
     try:
-        history = orchestrator.get_conversation_history()
+        session = get_session()
+        if not session.busy:
+            session.orchestrator.refresh()
+        since = max(0, request.args.get('since', 0, type=int))
+        limit = min(max(1, request.args.get('limit', 200, type=int)), MAX_PAGE_SIZE)
+        history = session.orchestrator.get_history_page(since, limit + 1)
+        page = history[:limit]
         return jsonify({
             "success": True,
-            "conversation": history
+            "session_id": session.id,
+            "summary": session.orchestrator.get_summary(),
+            "conversation": page,
+            "next_since": page[-1]["seq"] if page else since,
+            "has_more": len(history) > limit,
+            "last_seq": session.orchestrator.last_seq()
         })
     except Exception as e:
         return jsonify({
@@ -237,12 +607,70 @@ def get_conversation():
             "error": str(e)
         }), 500
 
+def conditional(response, etag: str):
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    response.vary.add('X-Session-Id')
+    return response.make_conditional(request)
+
+@app.route('/api/artifacts', methods=['GET'])
+def list_artifacts():
+    try:
+        session = get_session()
+        artifacts = session.orchestrator.sync_artifacts()
+        return conditional(jsonify({
+            "success": True,
+            "session_id": session.id,
+            "artifacts": [artifacts.summary(artifact) for artifact in artifacts.latest()]
+        }), artifacts.etag())
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/artifacts/<path:key>', methods=['GET'])
+def get_artifact(key):
+    try:
+        session = get_session()
+        artifacts = session.orchestrator.sync_artifacts()
+        artifact = artifacts.get(key, request.args.get('version', type=int))
+        if artifact is None:
+            return jsonify({
+                "success": False,
+                "error": f"Artifact '{key}' not found",
+                "session_id": session.id
+            }), 404
+
+        return conditional(jsonify({
+            "success": True,
+            "session_id": session.id,
+            "artifact": artifact,
+            "versions": [artifacts.summary(version) for version in artifacts.versions(key)]
+        }), f"{artifact['etag']}-{len(artifacts.versions(key))}")
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
 @app.route('/api/reset', methods=['POST'])
 def reset():
     try:
-        orchestrator.reset()
+        session = get_session()
+        if session.busy:
+            session.orchestrator.cancel()
+        if not session.lock.acquire(timeout=orchestrator.config.get_float('CANCEL_WAIT_SECONDS', 10)):
+            return session_busy(session)
+        try:
+            session.orchestrator.reset()
+        finally:
+            session.lock.release()
+            session.touch()
+
         return jsonify({
             "success": True,
+            "session_id": session.id,
             "message": "Conversation reset successfully"
         })
     except Exception as e:
@@ -268,6 +696,10 @@ if __name__ == '__main__':
     if not status['available_agents']:
         print("  ⚠️  No agents available! Please configure API keys in config.properties")
 
+    print(f"\nStartup: ready in {startup.ready_ms:.0f} ms")
+    for phase, ms in startup.phases.items():
+        print(f"  {phase:<16} {ms:>8.1f} ms")
+
     print("\n" + "="*60)
     print("Server starting at: http://localhost:5000")
     print("="*60 + "\n")
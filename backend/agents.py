@@ -1,108 +1,307 @@
-import openai
-import google.generativeai as genai
-from groq import Groq
-from typing import List, Dict
+import asyncio
+import threading
+import time
+import weakref
+from typing import Any, Callable, List, Dict, Iterator, Optional
+from backend.call_context import CallContext
+from backend.context_builder import ContextBuilder, budget_for_model, estimate_tokens
+from backend.http_pool import HttpPool
+from backend.metrics import TOKENS
+from backend.resilience import ProviderError, ProviderGuard
+from backend.startup import startup
+
+CODE_BLOCK_INSTRUCTION = "IMPORTANT: When sharing code, ALWAYS wrap it in markdown code blocks using triple backticks (```) with the language specified, like ```python or ```javascript or ```html."
 
 class Agent:
-    def __init__(self, name: str, role: str, model: str):
+    max_tokens = 1000
+    context_tokens = 2000
+    temperature = 0.7
+
+    def __init__(self, name: str, role: str, model: str, context_tokens: Optional[int] = None,
+                 guard: Optional[ProviderGuard] = None):
         self.name = name
         self.role = role
         self.model = model
+        self.guard = guard or ProviderGuard(name)
+        self.context_builder = ContextBuilder(
+            budget_for_model(model, self.max_tokens, context_tokens or self.context_tokens)
+        )
+        self._clients = {}
+        self._loop_clients = weakref.WeakKeyDictionary()
+        self._clients_lock = threading.Lock()
+
+    def _client(self, kind: str, factory: Callable[[], Any]) -> Any:
+        client = self._clients.get(kind)
+        if client is None:
+            with self._clients_lock:
+                client = self._clients.get(kind)
+                if client is None:
+                    started = time.perf_counter()
+                    client = self._clients[kind] = factory()
+                    startup.record_lazy(f"{self.name}.{kind}", time.perf_counter() - started)
+        return client
 
-    def call(self, prompt: str, context: List[Dict]) -> str:
+    def _loop_client(self, kind: str, factory: Callable[[], Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            client = self._loop_clients.get(loop)
+            if client is None:
+                started = time.perf_counter()
+                client = self._loop_clients[loop] = factory()
+                startup.record_lazy(f"{self.name}.{kind}", time.perf_counter() - started)
+        return client
+
+    def system_prompt(self) -> str:
+        return f"You are a {self.role}. You are collaborating with other AI agents to build a project. {CODE_BLOCK_INSTRUCTION}"
+
+    def build_messages(self, prompt: str, context: List[Dict]) -> List[Dict]:
+        messages = [{"role": "system", "content": self.system_prompt()}]
+        messages.extend(self.context_builder.build(context))
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def estimate_request_tokens(self, messages: List[Dict]) -> int:
+        return sum(estimate_tokens(msg["content"]) for msg in messages) + self.max_tokens
+
+    def record_usage(self, ctx: Optional[CallContext], prompt_tokens: Optional[int], completion_tokens: Optional[int],
+                     cached_tokens: Optional[int] = None):
+        prompt_tokens, completion_tokens, cached_tokens = prompt_tokens or 0, completion_tokens or 0, cached_tokens or 0
+        TOKENS.inc(prompt_tokens, provider=self.name, type="prompt")
+        TOKENS.inc(completion_tokens, provider=self.name, type="completion")
+        TOKENS.inc(cached_tokens, provider=self.name, type="cached_prompt")
+        if ctx is not None:
+            ctx.add_usage(prompt_tokens, completion_tokens, cached_tokens)
+
+    def complete(self, messages: List[Dict], ctx: Optional[CallContext] = None) -> str:
         raise NotImplementedError
 
+    def complete_stream(self, messages: List[Dict], ctx: Optional[CallContext] = None) -> Iterator[str]:
+        yield self.complete(messages, ctx)
 
-class ChatGPTAgent(Agent):
-    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo"):
-        super().__init__("ChatGPT", "Product Manager", model)
-        self.client = openai.OpenAI(api_key=api_key)
+    async def acomplete(self, messages: List[Dict], ctx: Optional[CallContext] = None) -> str:
+        return await asyncio.to_thread(self.complete, messages, ctx)
 
-    def call(self, prompt: str, context: List[Dict]) -> str:
-        messages = [
-            {"role": "system", "content": f"You are a {self.role}. You are collaborating with other AI agents to build a project. IMPORTANT: When sharing code, ALWAYS wrap it in markdown code blocks using triple backticks (```) with the language specified, like ```python or ```javascript or ```html. This ensures proper formatting."}
-        ]
+    def call(self, prompt: str, context: List[Dict], ctx: Optional[CallContext] = None) -> str:
+        return self.complete(self.build_messages(prompt, context), ctx)
 
-        recent_context = context[-5:] if len(context) > 5 else context
+    def stream(self, prompt: str, context: List[Dict], ctx: Optional[CallContext] = None) -> Iterator[str]:
+        return self.complete_stream(self.build_messages(prompt, context), ctx)
 
-        for msg in recent_context:
-            messages.append({
-                "role": "assistant" if msg["agent"] != "User" else "user",
-                "content": f"[{msg['agent']}]: {msg['message'][:500]}"
-            })
+    async def acall(self, prompt: str, context: List[Dict], ctx: Optional[CallContext] = None) -> str:
+        return await self.acomplete(self.build_messages(prompt, context), ctx)
 
-        messages.append({"role": "user", "content": prompt})
 
-        try:
-            response = self.client.chat.completions.create(
+class ChatCompletionsAgent(Agent):
+    stream_options = None
+
+    def __init__(self, name: str, role: str, model: str, api_key: str, context_tokens: Optional[int] = None,
+                 guard: Optional[ProviderGuard] = None, pool: Optional[HttpPool] = None):
+        super().__init__(name, role, model, context_tokens, guard)
+        self.api_key = api_key
+        self.pool = pool
+
+    def _sdk_client(self, asynchronous: bool) -> Any:
+        raise NotImplementedError
+
+    def _client_options(self, asynchronous: bool) -> Dict:
+        options = {"api_key": self.api_key, "timeout": self.guard.timeout, "max_retries": 0}
+        if self.pool is not None:
+            options["http_client"] = self.pool.async_client() if asynchronous else self.pool.client()
+        return options
+
+    @property
+    def client(self) -> Any:
+        return self._client("client", lambda: self._sdk_client(False))
+
+    @property
+    def async_client(self) -> Any:
+        return self._loop_client("async_client", lambda: self._sdk_client(True))
+
+    def _record_response_usage(self, ctx: Optional[CallContext], usage):
+        if usage is not None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            self.record_usage(ctx, usage.prompt_tokens, usage.completion_tokens, getattr(details, "cached_tokens", None))
+
+    def _response_text(self, response, ctx: Optional[CallContext]) -> str:
+        self._record_response_usage(ctx, response.usage)
+        text = response.choices[0].message.content if response.choices else None
+        if not text:
+            reason = response.choices[0].finish_reason if response.choices else "no choices"
+            raise ProviderError(self.guard.provider, f"empty response ({reason})", kind="empty_response")
+        return text
+
+    def complete(self, messages: List[Dict], ctx: Optional[CallContext] = None) -> str:
+        return self.guard.call(lambda: self._response_text(self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens
+        ), ctx), ctx, self.estimate_request_tokens(messages))
+
+    async def acomplete(self, messages: List[Dict], ctx: Optional[CallContext] = None) -> str:
+        async def request() -> str:
+            return self._response_text(await self.async_client.chat.completions.create(
                 model=self.model,
                 messages=messages,
-                temperature=0.7,
-                max_tokens=600
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Error calling ChatGPT: {str(e)}"
+                temperature=self.temperature,
+                max_tokens=self.max_tokens
+            ), ctx)
+
+        return await self.guard.acall(request, ctx, self.estimate_request_tokens(messages))
+
+    def complete_stream(self, messages: List[Dict], ctx: Optional[CallContext] = None) -> Iterator[str]:
+        return self.guard.stream(lambda: self._stream_chunks(messages, ctx), ctx, self.estimate_request_tokens(messages))
+
+    def _stream_chunks(self, messages: List[Dict], ctx: Optional[CallContext] = None) -> Iterator[str]:
+        options = {"stream_options": self.stream_options} if self.stream_options else {}
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stream=True,
+            **options
+        )
+        abandon = ctx.cancel_token.on_cancel(response.close) if ctx is not None and ctx.cancel_token is not None else None
+        try:
+            for chunk in response:
+                self._record_response_usage(ctx, chunk.usage or getattr(getattr(chunk, "x_groq", None), "usage", None))
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            if abandon is not None:
+                abandon()
+            response.close()
+
+
+class ChatGPTAgent(ChatCompletionsAgent):
+    max_tokens = 600
+    stream_options = {"include_usage": True}
+
+    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo", context_tokens: Optional[int] = None,
+                 guard: Optional[ProviderGuard] = None, pool: Optional[HttpPool] = None):
+        super().__init__("ChatGPT", "Product Manager", model, api_key, context_tokens, guard, pool)
+
+    def _sdk_client(self, asynchronous: bool) -> Any:
+        import openai
+        client_class = openai.AsyncOpenAI if asynchronous else openai.OpenAI
+        return client_class(**self._client_options(asynchronous))
+
+    def system_prompt(self) -> str:
+        return f"{super().system_prompt()} This ensures proper formatting."
 
 
 class GeminiAgent(Agent):
-    def __init__(self, api_key: str, model: str = "gemini-2.5-flash"):
-        super().__init__("Gemini", "Full-Stack Developer", model)
-        genai.configure(api_key=api_key)
-        self.gemini_model = genai.GenerativeModel(model)
+    context_tokens = 4000
 
-    def call(self, prompt: str, context: List[Dict]) -> str:
-        recent_context = context[-5:] if len(context) > 5 else context
+    def __init__(self, api_key: str, model: str = "gemini-2.5-flash", context_tokens: Optional[int] = None,
+                 guard: Optional[ProviderGuard] = None):
+        super().__init__("Gemini", "Full-Stack Developer", model, context_tokens, guard)
+        self.api_key = api_key
 
-        context_str = "\n".join([
-            f"[{msg['agent']}]: {msg['message'][:500]}"
-            for msg in recent_context
-        ])
+    @property
+    def gemini_model(self) -> Any:
+        return self._client("model", self._create_model)
 
-        full_prompt = f"""You are a {self.role}. You are collaborating with other AI agents to build a project.
+    @property
+    def async_gemini_model(self) -> Any:
+        return self._loop_client("async_model", self._create_async_model)
 
-Previous conversation:
-{context_str}
+    def system_prompt(self) -> str:
+        return f"{super().system_prompt()} Provide your response with code examples where applicable. Keep responses concise."
 
-Your task: {prompt}
+    def _create_model(self) -> Any:
+        import google.generativeai as genai
+        genai.configure(api_key=self.api_key)
+        return genai.GenerativeModel(self.model, system_instruction=self.system_prompt())
 
-IMPORTANT: When sharing code, ALWAYS wrap it in markdown code blocks using triple backticks (```) with the language specified, like ```python or ```javascript or ```html.
-Provide your response with code examples where applicable. Keep responses concise."""
+    def _create_async_model(self) -> Any:
+        from google.generativeai import client
 
-        try:
-            response = self.gemini_model.generate_content(full_prompt)
-            return response.text
-        except Exception as e:
-            return f"Error calling Gemini: {str(e)}"
+        model = self._create_model()
+        model._async_client = client._client_manager.make_client("generative_async")
+        return model
 
+    def _contents(self, messages: List[Dict]) -> List[Dict]:
+        history = [msg["content"] for msg in messages[1:-1]]
+        parts = (["Previous conversation:"] + history if history else []) + [f"Your task: {messages[-1]['content']}"]
+        return [{"role": "user", "parts": parts}]
 
-class GroqAgent(Agent):
-    def __init__(self, api_key: str, model: str = "llama-3.3-70b-versatile"):
-        super().__init__("Groq", "QA Engineer", model)
-        self.client = Groq(api_key=api_key)
+    def _record_response_usage(self, ctx: Optional[CallContext], usage):
+        if usage is not None:
+            self.record_usage(ctx, usage.prompt_token_count, usage.candidates_token_count,
+                              getattr(usage, "cached_content_token_count", None))
 
-    def call(self, prompt: str, context: List[Dict]) -> str:
-        messages = [
-            {"role": "system", "content": f"You are a {self.role}. You are collaborating with other AI agents. Be concise. IMPORTANT: When sharing code, ALWAYS wrap it in markdown code blocks using triple backticks (```) with the language specified, like ```python or ```javascript or ```html."}
-        ]
+    def _response_text(self, response, ctx: Optional[CallContext]) -> str:
+        self._record_response_usage(ctx, getattr(response, "usage_metadata", None))
+        try:
+            text = response.text
+        except ValueError as exc:
+            raise ProviderError(self.guard.provider, f"no text in response: {exc}", kind="empty_response") from exc
+        if not text:
+            raise ProviderError(self.guard.provider, "empty response", kind="empty_response")
+        return text
 
-        recent_context = context[-3:] if len(context) > 3 else context
+    def complete(self, messages: List[Dict], ctx: Optional[CallContext] = None) -> str:
+        return self.guard.call(lambda: self._response_text(self.gemini_model.generate_content(
+            self._contents(messages),
+            request_options={"timeout": self.guard.timeout}
+        ), ctx), ctx, self.estimate_request_tokens(messages))
 
-        for msg in recent_context:
-            messages.append({
-                "role": "assistant" if msg["agent"] != "User" else "user",
-                "content": f"[{msg['agent']}]: {msg['message'][:400]}"
-            })
+    async def acomplete(self, messages: List[Dict], ctx: Optional[CallContext] = None) -> str:
+        async def request() -> str:
+            return self._response_text(await self.async_gemini_model.generate_content_async(
+                self._contents(messages),
+                request_options={"timeout": self.guard.timeout}
+            ), ctx)
 
-        messages.append({"role": "user", "content": prompt})
+        return await self.guard.acall(request, ctx, self.estimate_request_tokens(messages))
+
+    def complete_stream(self, messages: List[Dict], ctx: Optional[CallContext] = None) -> Iterator[str]:
+        return self.guard.stream(lambda: self._stream_chunks(messages, ctx), ctx, self.estimate_request_tokens(messages))
 
+    def _stream_chunks(self, messages: List[Dict], ctx: Optional[CallContext] = None) -> Iterator[str]:
+        response = self.gemini_model.generate_content(
+            self._contents(messages),
+            stream=True,
+            request_options={"timeout": self.guard.timeout}
+        )
+        abandon = ctx.cancel_token.on_cancel(lambda: self._abort(response)) if ctx is not None and ctx.cancel_token is not None else None
+        usage = None
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=500
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Error calling Groq: {str(e)}"
+            for chunk in response:
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                if chunk.parts:
+                    yield chunk.text
+            self._record_response_usage(ctx, usage)
+        finally:
+            if abandon is not None:
+                abandon()
+            self._abort(response)
+
+    @staticmethod
+    def _abort(response: Any):
+        iterator = getattr(response, "_iterator", None)
+        stop = getattr(iterator, "cancel", None) or getattr(iterator, "close", None)
+        if stop is not None:
+            try:
+                stop()
+            except ValueError:
+                pass
+
+
+class GroqAgent(ChatCompletionsAgent):
+    max_tokens = 500
+    context_tokens = 1500
+
+    def __init__(self, api_key: str, model: str = "llama-3.3-70b-versatile", context_tokens: Optional[int] = None,
+                 guard: Optional[ProviderGuard] = None, pool: Optional[HttpPool] = None):
+        super().__init__("Groq", "QA Engineer", model, api_key, context_tokens, guard, pool)
+
+    def _sdk_client(self, asynchronous: bool) -> Any:
+        import groq
+        client_class = groq.AsyncGroq if asynchronous else groq.Groq
+        return client_class(**self._client_options(asynchronous))
+
+    def system_prompt(self) -> str:
+        return f"You are a {self.role}. You are collaborating with other AI agents. Be concise. {CODE_BLOCK_INSTRUCTION}"
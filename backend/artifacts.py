@@ -0,0 +1,185 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+FENCE_OPEN = re.compile(r'^\s*(`{3,}|~{3,})\s*([^\s`]*)\s*(.*?)\s*$')
+FILENAME = r'[\w.-]*(?:/[\w.-]+)*\.[A-Za-z0-9]{1,8}'
+INFO_FILENAME = re.compile(rf'(?:^|\s)(?:file(?:name)?=|title=)?["\']?({FILENAME})["\']?(?:\s|$)', re.I)
+HEADING_FILENAME = re.compile(
+    rf'^\s*(?:#+\s*|[-*]\s*)?(?:\*\*|`)?(?:file(?:name)?:\s*)?(?:\*\*|`)?({FILENAME})(?:\*\*|`)?\s*:?\s*(?:\*\*)?\s*$', re.I
+)
+INLINE_FILENAME = re.compile(rf'`({FILENAME})`[^`]*:\s*(?:\*\*)?\s*$')
+COMMENT_FILENAME = re.compile(
+    rf'^\s*(?:#|//|--|<!--|/\*)\s*(?:file(?:name)?:\s*)?({FILENAME})\s*(?:-->|\*/)?\s*$', re.I
+)
+
+def _hinted_filename(line: Optional[str]) -> Optional[str]:
+    if not line or len(line) > 160:
+        return None
+    match = HEADING_FILENAME.match(line) or INLINE_FILENAME.search(line)
+    return match.group(1) if match else None
+
+
+class CodeBlockParser:
+    def __init__(self):
+        self.blocks = []
+        self._partial = ""
+        self._hint = None
+        self._block = None
+
+    def feed(self, text: str) -> List[Dict]:
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        completed = []
+        for line in lines:
+            block = self._line(line)
+            if block is not None:
+                completed.append(block)
+        return completed
+
+    def close(self) -> List[Dict]:
+        completed = []
+        if self._partial:
+            block = self._line(self._partial)
+            self._partial = ""
+            if block is not None:
+                completed.append(block)
+        if self._block is not None and self._block["lines"]:
+            completed.append(self._finish())
+        self._block = None
+        return completed
+
+    def _line(self, line: str) -> Optional[Dict]:
+        if self._block is None:
+            match = FENCE_OPEN.match(line)
+            if match is None:
+                if line.strip():
+                    self._hint = line
+                return None
+            info = INFO_FILENAME.search(match.group(3))
+            self._block = {
+                "fence": match.group(1),
+                "language": match.group(2).lower() or "text",
+                "filename": info.group(1) if info else _hinted_filename(self._hint),
+                "lines": []
+            }
+            self._hint = None
+            return None
+
+        stripped = line.strip()
+        fence = self._block["fence"]
+        if stripped and stripped[0] == fence[0] and len(stripped) >= len(fence) and stripped == stripped[0] * len(stripped):
+            return self._finish()
+        self._block["lines"].append(line)
+        return None
+
+    def _finish(self) -> Dict:
+        block, self._block = self._block, None
+        lines = block["lines"]
+        filename = block["filename"]
+        if filename is None and lines:
+            match = COMMENT_FILENAME.match(lines[0])
+            filename = match.group(1) if match else None
+        finished = {"language": block["language"], "filename": filename, "content": "\n".join(lines)}
+        self.blocks.append(finished)
+        return finished
+
+
+def extract_code_blocks(text: str) -> List[Dict]:
+    parser = CodeBlockParser()
+    parser.feed(text)
+    parser.close()
+    return parser.blocks
+
+
+def render_code_blocks(blocks: List[Dict]) -> str:
+    rendered = []
+    for block in blocks:
+        fence = "`" * max([3] + [len(run) + 1 for run in re.findall(r"`{3,}", block["content"])])
+        heading = f"{block['filename']}:\n" if block["filename"] else ""
+        rendered.append(f"{heading}{fence}{block['language']}\n{block['content']}\n{fence}")
+    return "\n\n".join(rendered)
+
+
+def content_etag(content: str) -> str:
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]
+
+
+class ArtifactIndex:
+    def __init__(self):
+        self._artifacts = OrderedDict()
+        self._indexed = set()
+        self._synced_through = 0
+        self._lock = threading.Lock()
+
+    def record(self, seq: int, agent: str, blocks: List[Dict]) -> List[Dict]:
+        with self._lock:
+            if seq in self._indexed:
+                return []
+            self._indexed.add(seq)
+
+            recorded = []
+            unnamed = {}
+            for block in blocks:
+                if not block["content"].strip():
+                    continue
+                if block["filename"]:
+                    key = block["filename"]
+                else:
+                    unnamed[block["language"]] = unnamed.get(block["language"], 0) + 1
+                    key = f"{block['language']}-{unnamed[block['language']]}"
+
+                versions = self._artifacts.setdefault(key, [])
+                etag = content_etag(block["content"])
+                if versions and versions[-1]["etag"] == etag:
+                    continue
+                versions.append({
+                    "key": key,
+                    "version": len(versions) + 1,
+                    "language": block["language"],
+                    "filename": block["filename"],
+                    "agent": agent,
+                    "seq": seq,
+                    "etag": etag,
+                    "lines": block["content"].count("\n") + 1,
+                    "content": block["content"]
+                })
+                recorded.append(versions[-1])
+            return recorded
+
+    def sync(self, history_store, session_key: str, page_size: int = 1000):
+        while True:
+            messages = history_store.page(session_key, self._synced_through, page_size)
+            for msg in messages:
+                self.record(msg["seq"], msg["agent"], extract_code_blocks(msg["message"]))
+            if messages:
+                self._synced_through = messages[-1]["seq"]
+            if len(messages) < page_size:
+                return
+
+    @staticmethod
+    def summary(artifact: Dict) -> Dict:
+        return {key: value for key, value in artifact.items() if key != "content"}
+
+    def latest(self) -> List[Dict]:
+        with self._lock:
+            return [versions[-1] for versions in self._artifacts.values()]
+
+    def get(self, key: str, version: Optional[int] = None) -> Optional[Dict]:
+        with self._lock:
+            versions = self._artifacts.get(key)
+            if not versions:
+                return None
+            if version is None:
+                return versions[-1]
+            return versions[version - 1] if 0 < version <= len(versions) else None
+
+    def versions(self, key: str) -> List[Dict]:
+        with self._lock:
+            return list(self._artifacts.get(key, []))
+
+    def etag(self) -> str:
+        with self._lock:
+            return content_etag(";".join(f"{key}:{versions[-1]['etag']}" for key, versions in self._artifacts.items()))
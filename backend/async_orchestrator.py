@@ -0,0 +1,178 @@
+import asyncio
+import time
+from typing import List, Dict, Optional, Tuple
+from backend.artifacts import extract_code_blocks
+from backend.orchestrator import Orchestrator
+from backend.resilience import ProviderError, classify_error
+from backend.workflows import Workflow, WorkflowRun
+
+class AsyncOrchestrator(Orchestrator):
+    async def call_agent(self, agent_name: str, prompt: str) -> Dict:
+        if agent_name not in self.agents:
+            return {
+                "success": False,
+                "error": f"Agent '{agent_name}' not available. Available agents: {self.get_available_agents()}"
+            }
+
+        agent = self.agents[agent_name]
+        started = time.perf_counter()
+
+        try:
+            response, delivery = await self._arespond(agent_name, agent.build_messages(prompt, self.agent_context()))
+        except ProviderError as e:
+            self._observe_turn(agent_name, "async", started, self._error_outcome(e))
+            return self._error_result(agent_name, agent, e)
+
+        seq = self.add_message(agent_name, response)
+        artifacts = self.index_artifacts(seq, agent_name, extract_code_blocks(response))
+        await self.acompact()
+        self._observe_turn(agent_name, "async", started, "cached" if delivery["cached"] else "success")
+
+        return {
+            "success": True,
+            "agent": agent_name,
+            "role": agent.role,
+            "response": response,
+            **delivery,
+            "seq": seq,
+            "artifacts": artifacts
+        }
+
+    async def _arespond(self, agent_name: str, messages: List[Dict]) -> Tuple[str, Dict]:
+        agent = self.agents[agent_name]
+        ctx = self.call_context()
+        key = self._cache_key(agent, messages)
+        cached = self._cached_response(key)
+        if cached is not None:
+            return cached, {"cached": True, "served_by": agent_name, "hedged": False, "usage": ctx.usage}
+
+        alternate = self._alternate(agent_name)
+        if alternate is None:
+            response, served_by, hedged = await agent.acomplete(messages, ctx), agent_name, False
+        else:
+            response, served_by, hedged = await self.hedger.acomplete((agent_name, agent), alternate, messages, ctx)
+
+        if served_by == agent_name:
+            self._store_response(key, response)
+        return response, {"cached": False, "served_by": served_by, "hedged": hedged, "usage": ctx.usage}
+
+    async def acompact(self) -> bool:
+        if not self.compactor.should_compact(self.conversation_history):
+            return False
+
+        agent_name = self.compactor.pick_agent(self.agents)
+        if agent_name is None:
+            return False
+
+        if not self._compaction_lock.acquire(blocking=False):
+            return False
+        try:
+            folded, _ = self.compactor.split(self.conversation_history)
+            text = await self.agents[agent_name].acall(self.compactor.prompt(self.summary, folded), [], self.call_context())
+            return self._apply_compaction(text, folded)
+        except ProviderError:
+            return False
+        finally:
+            self._compaction_lock.release()
+
+    async def fan_out(self, calls: List[Tuple[str, str]]) -> List[Dict]:
+        context = self.agent_context()
+        agents = [self.agents[agent_name] for agent_name, _ in calls]
+        started = time.perf_counter()
+
+        responses = await asyncio.gather(*[
+            self._arespond(agent_name, agent.build_messages(prompt, context))
+            for agent, (agent_name, prompt) in zip(agents, calls)
+        ], return_exceptions=True)
+
+        results = []
+        for agent, (agent_name, _), outcome in zip(agents, calls, responses):
+            if isinstance(outcome, ProviderError):
+                self._observe_turn(agent_name, "fan_out", started, self._error_outcome(outcome))
+                results.append(self._error_result(agent_name, agent, outcome))
+                continue
+            if isinstance(outcome, BaseException):
+                raise outcome
+
+            response, delivery = outcome
+            self._observe_turn(agent_name, "fan_out", started, "cached" if delivery["cached"] else "success")
+            seq = self.add_message(agent_name, response)
+            results.append({
+                "success": True,
+                "agent": agent_name,
+                "role": agent.role,
+                "response": response,
+                **delivery,
+                "seq": seq,
+                "artifacts": self.index_artifacts(seq, agent_name, extract_code_blocks(response))
+            })
+
+        await self.acompact()
+        return results
+
+    async def run_workflow(self, workflow: Workflow, user_request: str) -> List[Dict]:
+        self.add_message("User", user_request)
+
+        run = WorkflowRun(workflow, user_request, self.agents)
+        semaphore = asyncio.Semaphore(self.max_parallel_nodes)
+        results = {}
+        running = {}
+
+        async def run_node(node, prompt: str) -> Dict:
+            async with semaphore:
+                return await self.call_agent(node.agent, prompt)
+
+        try:
+            while True:
+                for node in [] if self.cancelled else run.ready():
+                    running[asyncio.ensure_future(run_node(node, run.prompt(node)))] = node
+                if not running:
+                    break
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    node = running.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        result = self._error_result(node.agent, self.agents[node.agent], classify_error(node.agent, e))
+                    results[node.id] = dict(result, node=node.id)
+                    run.finish(node.id, results[node.id].get("response"))
+        finally:
+            for task in running:
+                task.cancel()
+
+        return [results[node.id] for node in workflow.nodes if node.id in results]
+
+    async def run_sequential_workflow(self, user_request: str) -> List[Dict]:
+        return await self.run_workflow(self.get_workflow("sequential"), user_request)
+
+    async def run_round_robin_discussion(self, topic: str, rounds: int = 2, options: Optional[Dict] = None) -> List[Dict]:
+        discussion_steps = []
+
+        self.add_message("User", f"Discussion topic: {topic}")
+
+        scheduler = self.discussion_scheduler(rounds, options)
+        turns = scheduler.turns()
+        for turn in turns:
+            if turn["type"] != "turn":
+                discussion_steps.append(dict(self._skipped_turn(turn), success=True))
+                continue
+
+            if turn["round"] == 1 and not scheduler.adaptive:
+                batch = [turn] + [next(turns) for _ in scheduler.agents[1:]]
+                results = await self.fan_out([
+                    (opening["agent"], self.discussion_prompt(topic, opening["round"]))
+                    for opening in batch
+                ])
+                discussion_steps.extend(
+                    self._discussion_step(scheduler, opening, result) for opening, result in zip(batch, results)
+                )
+                continue
+
+            if self.cancelled:
+                return discussion_steps
+            result = await self.call_agent(turn["agent"], self.discussion_prompt(topic, turn["round"]))
+            discussion_steps.append(self._discussion_step(scheduler, turn, result))
+
+        return discussion_steps
@@ -0,0 +1,63 @@
+import threading
+from typing import Callable, Optional
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._discard(callback)
+        callback()
+        return lambda: None
+
+    def _discard(self, callback: Callable[[], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def wait(self, timeout: float) -> bool:
+        return self._event.wait(timeout)
+
+
+class CallContext:
+    def __init__(self, session_id: Optional[str] = None, cancel_token: Optional[CancelToken] = None):
+        self.session_id = session_id or "default"
+        self.cancel_token = cancel_token
+        self.usage = {"prompt_tokens": 0, "completion_tokens": 0, "cached_prompt_tokens": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_token is not None and self.cancel_token.cancelled
+
+    def add_usage(self, prompt_tokens: int, completion_tokens: int, cached_prompt_tokens: int = 0):
+        with self._lock:
+            self.usage["prompt_tokens"] += prompt_tokens
+            self.usage["completion_tokens"] += completion_tokens
+            self.usage["cached_prompt_tokens"] += cached_prompt_tokens
+
+    def child(self) -> "CallContext":
+        token = CancelToken()
+        if self.cancel_token is not None:
+            self.cancel_token.on_cancel(token.cancel)
+        child = CallContext(self.session_id, token)
+        child.usage, child._lock = self.usage, self._lock
+        return child
@@ -0,0 +1,52 @@
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+from backend.context_builder import truncate_to_tokens
+
+SUMMARY_AGENT_NAME = "Summary"
+MIN_MESSAGE_TOKENS = 100
+
+class Compactor:
+    def __init__(self, max_messages: int = 20, keep_recent: int = 6, input_tokens: int = 6000, preferred_agent: str = "groq"):
+        self.max_messages = max_messages
+        self.keep_recent = keep_recent
+        self.input_tokens = input_tokens
+        self.preferred_agent = preferred_agent
+
+    def should_compact(self, history: List[Dict]) -> bool:
+        return len(history) > max(self.max_messages, self.keep_recent)
+
+    def split(self, history: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        cut = max(0, len(history) - self.keep_recent)
+        return history[:cut], history[cut:]
+
+    def pick_agent(self, agents: Dict) -> Optional[str]:
+        if self.preferred_agent in agents:
+            return self.preferred_agent
+        return next(iter(agents), None)
+
+    def prompt(self, summary: Optional[Dict], folded: List[Dict]) -> str:
+        per_message = max(MIN_MESSAGE_TOKENS, self.input_tokens // max(1, len(folded)))
+        transcript = "\n\n".join(
+            truncate_to_tokens(f"[{msg['agent']}]: {msg['message']}", per_message)
+            for msg in folded
+        )
+
+        previous = f"Current summary:\n{summary['message']}\n\n" if summary else ""
+
+        return (
+            "Update the running summary of a multi-agent conversation with the new turns below. "
+            "Keep the user's requirements, decisions made, open questions, and the names and purpose "
+            "of any files or code components. Drop pleasantries and repetition. "
+            "Write at most 250 words of plain prose, no code blocks.\n\n"
+            f"{previous}New turns:\n{transcript}"
+        )
+
+    def summary_message(self, text: str, summary: Optional[Dict], folded: List[Dict]) -> Dict:
+        return {
+            "agent": SUMMARY_AGENT_NAME,
+            "role": "Conversation Summary",
+            "message": text,
+            "timestamp": datetime.now().isoformat(),
+            "covers": (summary["covers"] if summary else 0) + len(folded),
+            "pinned": True
+        }
@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 from pathlib import Path
 from jproperties import Properties
 from dotenv import load_dotenv
@@ -6,6 +7,7 @@ from dotenv import load_dotenv
 class ConfigLoader:
     def __init__(self):
         self.config = {}
+        self.extra = {}
         self._load_config()
 
     def _load_config(self):
@@ -29,6 +31,8 @@ class ConfigLoader:
                 with open(props_path, 'rb') as f:
                     props.load(f)
 
+                self.extra = {key: props[key].data for key in props.keys()}
+
                 self.config = {
                     'OPENAI_API_KEY': props.get('OPENAI_API_KEY').data if props.get('OPENAI_API_KEY') else None,
                     'GOOGLE_API_KEY': props.get('GOOGLE_API_KEY').data if props.get('GOOGLE_API_KEY') else None,
@@ -38,11 +42,27 @@ class ConfigLoader:
                     'GROQ_MODEL': props.get('GROQ_MODEL').data if props.get('GROQ_MODEL') else 'llama-3.3-70b-versatile',
                 }
 
-    def get(self, key):
+    def get(self, key, default=None):
         value = self.config.get(key)
+        if value is None:
+            value = self.extra.get(key, os.getenv(key))
         if value and value.startswith('your_') and value.endswith('_here'):
             return None
-        return value
+        return value if value is not None else default
+
+    def get_int(self, key, default: Optional[int] = None) -> Optional[int]:
+        value = self.get(key)
+        return int(value) if value else default
+
+    def get_float(self, key, default: Optional[float] = None) -> Optional[float]:
+        value = self.get(key)
+        return float(value) if value else default
+
+    def get_bool(self, key, default: bool = False) -> bool:
+        value = self.get(key)
+        if not value:
+            return default
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
 
     def is_configured(self):
         return any([
@@ -0,0 +1,116 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gemini-pro": 32760,
+    "gemini-1.5-flash": 1048576,
+    "gemini-1.5-pro": 2097152,
+    "gemini-2.0-flash": 1048576,
+    "gemini-2.5-flash": 1048576,
+    "gemini-2.5-pro": 1048576,
+    "llama-3.1-8b-instant": 131072,
+    "llama-3.3-70b-versatile": 131072,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+PROMPT_RESERVE_TOKENS = 512
+MIN_TRUNCATED_TOKENS = 64
+PREFIX_STEP_MESSAGES = 8
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def estimate_tokens(text: str) -> int:
+    tokens = 0
+    for piece in TOKEN_PATTERN.findall(text):
+        tokens += (len(piece) + 3) // 4 if piece[0].isalnum() or piece[0] == '_' else 1
+    return tokens
+
+def truncate_to_tokens(text: str, budget: int, tokens: Optional[int] = None) -> str:
+    tokens = estimate_tokens(text) if tokens is None else tokens
+    if tokens <= budget:
+        return text
+    keep = max(1, len(text) * (budget - 8) // tokens)
+    return text[:keep].rstrip() + " …[truncated]"
+
+def budget_for_model(model: str, max_output_tokens: int, requested: int) -> int:
+    window = MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+    return max(0, min(requested, window - max_output_tokens - PROMPT_RESERVE_TOKENS))
+
+
+class ContextBuilder:
+    def __init__(self, budget_tokens: int, cache_size: int = 4096, prefix_step: int = PREFIX_STEP_MESSAGES):
+        self.budget_tokens = budget_tokens
+        self.prefix_step = max(1, prefix_step)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encode(self, msg: Dict) -> Tuple[str, int]:
+        key = (msg["agent"], msg.get("timestamp"), msg["message"])
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        content = f"[{msg['agent']}]: {msg['message']}"
+        encoded = (content, estimate_tokens(content))
+
+        with self._lock:
+            self._cache[key] = encoded
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return encoded
+
+    def build(self, context: List[Dict], budget_tokens: Optional[int] = None) -> List[Dict]:
+        remaining = self.budget_tokens if budget_tokens is None else budget_tokens
+        selected = {}
+
+        for pinned in self._pinned_indexes(context):
+            content, tokens = self.encode(context[pinned])
+            if tokens <= remaining:
+                selected[pinned] = content
+                remaining -= tokens
+
+        start = len(context)
+        for index in range(len(context) - 1, -1, -1):
+            if index in selected:
+                continue
+            tokens = self.encode(context[index])[1]
+            if tokens > remaining:
+                break
+            remaining -= tokens
+            start = index
+
+        step = max(1, min(self.prefix_step, (len(context) - start) // 2))
+        aligned = -(-start // step) * step
+        for index in range(aligned, len(context)):
+            if index not in selected:
+                selected[index] = self.encode(context[index])[0]
+
+        newest = len(context) - 1
+        if 0 <= newest < start and newest not in selected and remaining >= MIN_TRUNCATED_TOKENS:
+            content, tokens = self.encode(context[newest])
+            selected[newest] = truncate_to_tokens(content, remaining, tokens)
+
+        return [
+            {
+                "role": "assistant" if context[index]["agent"] != "User" else "user",
+                "content": selected[index]
+            }
+            for index in sorted(selected)
+        ]
+
+    def _pinned_indexes(self, context: List[Dict]) -> List[int]:
+        pinned = [index for index, msg in enumerate(context) if msg.get("pinned")]
+        for index in range(len(context) - 1, -1, -1):
+            if context[index]["agent"] == "User":
+                pinned.append(index)
+                break
+        return pinned
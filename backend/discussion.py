@@ -0,0 +1,146 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterator, List, Optional
+
+DISCUSSION_MODES = ("fixed", "adaptive")
+SPEAKER_ORDERS = ("rotation", "relevance")
+MIN_DISTINCT_WORDS = 12
+
+WORD_PATTERN = re.compile(r"[a-z0-9_]+")
+STOPWORDS = frozenset(
+    "a about above after again all also am an and any are as at be because been before being both but by can could "
+    "did do does doing each few for from further had has have having he her here hers him his how i if in into is it "
+    "its just me more most my no nor not now of off on once only or other our ours out over own same she should so "
+    "some such than that the their theirs them then there these they this those through to too under until up very "
+    "was we were what when where which while who whom why will with would you your yours".split()
+)
+
+class DiscussionError(ValueError):
+    pass
+
+
+def terms(text: str) -> Counter:
+    words = [word for word in WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+    return Counter(words + [f"{first} {second}" for first, second in zip(words, words[1:])])
+
+
+def similarity(first: Counter, second: Counter) -> float:
+    if not first or not second:
+        return 0.0
+    dot = sum(count * second[term] for term, count in first.items() if term in second)
+    norm = math.sqrt(sum(count * count for count in first.values())) * math.sqrt(sum(count * count for count in second.values()))
+    return dot / norm
+
+
+def novelty(turn: Counter, prior: List[Counter]) -> float:
+    if not turn:
+        return 0.0
+    distinct_words = sum(1 for term in turn if " " not in term)
+    substance = min(1.0, distinct_words / MIN_DISTINCT_WORDS)
+    if not prior:
+        return round(substance, 3)
+
+    seen = set().union(*prior)
+    new_terms = sum(count for term, count in turn.items() if term not in seen) / sum(turn.values())
+    overlap = max(similarity(turn, earlier) for earlier in prior)
+    return round(min(1.0 - overlap, new_terms) * substance, 3)
+
+
+class DiscussionScheduler:
+    def __init__(self, agents: List[str], rounds: int, roles: Optional[Dict[str, str]] = None, adaptive: bool = False,
+                 order: str = "rotation", threshold: float = 0.3, patience: int = 1):
+        self.agents = list(agents)
+        self.rounds = rounds
+        self.roles = {name: terms(f"{name} {role}") for name, role in (roles or {}).items()}
+        self.adaptive = adaptive
+        self.order = order
+        self.threshold = threshold
+        self.patience = max(1, patience)
+        self.history = []
+        self.last_turn = {}
+        self.strikes = {name: 0 for name in self.agents}
+        self.muted = set()
+        self._round_scores = []
+
+    def turns(self) -> Iterator[Dict]:
+        for round_num in range(self.rounds):
+            self._round_scores = []
+            pending = list(self.agents)
+            while pending:
+                agent = self._pick(pending)
+                pending.remove(agent)
+                if agent in self.muted:
+                    yield {"type": "skipped", "agent": agent, "round": round_num + 1, "reason": "low_novelty"}
+                else:
+                    yield {"type": "turn", "agent": agent, "round": round_num + 1}
+
+            remaining = (self.rounds - round_num - 1) * len(self.agents)
+            if remaining and self._converged():
+                yield {"type": "converged", "round": round_num + 1, "skipped_turns": remaining}
+                return
+
+    def record(self, agent: str, text: str) -> float:
+        turn = terms(text)
+        score = novelty(turn, self.history)
+        self.history.append(turn)
+        self.last_turn[agent] = turn
+        self._round_scores.append(score)
+
+        if self.adaptive:
+            if score < self.threshold:
+                self.strikes[agent] = self.strikes.get(agent, 0) + 1
+                if self.strikes[agent] >= self.patience:
+                    self.muted.add(agent)
+            else:
+                self.strikes[agent] = 0
+        return score
+
+    def _converged(self) -> bool:
+        if not self.adaptive:
+            return False
+        if self.muted.issuperset(self.agents):
+            return True
+        return bool(self._round_scores) and max(self._round_scores) < self.threshold
+
+    def _pick(self, pending: List[str]) -> str:
+        if self.order != "relevance" or not self.history:
+            return pending[0]
+        latest = self.history[-1]
+        return max(pending, key=lambda agent: self._relevance(agent, latest))
+
+    def _relevance(self, agent: str, latest: Counter) -> float:
+        if agent in self.muted:
+            return -1.0
+        role = self.roles.get(agent, terms(agent))
+        mentioned = any(term in latest for term in role if " " not in term)
+        return 2.0 * mentioned + similarity(role, latest) + 1.0 - similarity(self.last_turn.get(agent, Counter()), latest)
+
+
+def parse_discussion_rounds(data: Dict, default: int = 2) -> int:
+    rounds = data.get("rounds", default)
+    if not isinstance(rounds, int) or isinstance(rounds, bool) or rounds < 1:
+        raise DiscussionError("'rounds' must be a positive integer")
+    return rounds
+
+
+def parse_discussion_options(data: Dict) -> Dict:
+    options = {}
+    mode = data.get("mode")
+    if mode is not None:
+        if mode not in DISCUSSION_MODES:
+            raise DiscussionError(f"Unknown discussion mode '{mode}'. Use one of {list(DISCUSSION_MODES)}")
+        options["mode"] = mode
+
+    order = data.get("order")
+    if order is not None:
+        if order not in SPEAKER_ORDERS:
+            raise DiscussionError(f"Unknown speaker order '{order}'. Use one of {list(SPEAKER_ORDERS)}")
+        options["order"] = order
+
+    threshold = data.get("novelty_threshold")
+    if threshold is not None:
+        if not isinstance(threshold, (int, float)) or not 0 <= threshold <= 1:
+            raise DiscussionError("'novelty_threshold' must be a number between 0 and 1")
+        options["novelty_threshold"] = float(threshold)
+    return options
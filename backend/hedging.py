@@ -0,0 +1,207 @@
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+from backend.agents import Agent
+from backend.call_context import CallContext
+from backend.resilience import CallCancelledError
+
+MIN_SAMPLES_FOR_P95 = 20
+
+class Hedger:
+    def __init__(self, alternates: Dict[str, str], after_seconds: Optional[float] = None,
+                 default_after_seconds: float = 10.0, window: int = 200):
+        self.alternates = alternates
+        self.after_seconds = after_seconds
+        self.default_after_seconds = default_after_seconds
+        self._samples = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def alternate_for(self, agent_name: str, agents: Dict[str, Agent]) -> Optional[str]:
+        alternate = self.alternates.get(agent_name)
+        return alternate if alternate in agents and alternate != agent_name else None
+
+    def record_first_token(self, agent_name: str, seconds: float):
+        self._record((agent_name, "first_token"), seconds)
+
+    def record_completion(self, agent_name: str, seconds: float):
+        self._record((agent_name, "completion"), seconds)
+
+    def threshold(self, agent_name: str) -> float:
+        if self.after_seconds is not None:
+            return self.after_seconds
+        p95 = self._p95((agent_name, "first_token"))
+        return self.default_after_seconds if p95 is None else p95
+
+    def completion_threshold(self, agent_name: str) -> Optional[float]:
+        return self._p95((agent_name, "completion"))
+
+    def _record(self, key: Tuple[str, str], seconds: float):
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self._window)).append(seconds)
+
+    def _p95(self, key: Tuple[str, str]) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < MIN_SAMPLES_FOR_P95:
+            return None
+        return samples[int(len(samples) * 0.95) - 1]
+
+    def stream(self, primary: Tuple[str, Agent], alternate: Tuple[str, Agent], messages: List[Dict],
+               ctx: Optional[CallContext] = None, first_token_wins: bool = True) -> Iterator[Tuple[str, object]]:
+        ctx = ctx or CallContext()
+        events = queue.Queue()
+        contexts = {}
+        buffers = {}
+        failures = {}
+        committed = None
+        started_at = time.monotonic()
+        deadline = started_at + self.threshold(primary[0])
+
+        def launch(name: str, agent: Agent):
+            contexts[name] = ctx.child()
+            buffers[name] = []
+            threading.Thread(
+                target=self._pump, args=(name, agent, messages, contexts[name], events), daemon=True
+            ).start()
+
+        def commit(name: str):
+            if name != primary[0] and primary[0] not in failures:
+                self._record_loss(primary[0], started_at, first_token=not buffers[primary[0]])
+            for other, child in contexts.items():
+                if other != name:
+                    child.cancel_token.cancel()
+            return name
+
+        launch(*primary)
+        try:
+            while True:
+                waiting_on_primary = committed is None and len(contexts) == 1 and not buffers[primary[0]]
+                timeout = max(0.0, deadline - time.monotonic()) if waiting_on_primary else None
+                try:
+                    source, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    launch(*alternate)
+                    yield "hedge", "slow"
+                    continue
+
+                if committed is not None and source != committed:
+                    continue
+
+                if kind == "delta":
+                    if source == primary[0] and not buffers[source]:
+                        self.record_first_token(source, time.monotonic() - started_at)
+                    if committed is None and first_token_wins:
+                        committed = commit(source)
+                        yield "commit", source
+                    buffers[source].append(payload)
+                    if committed is not None:
+                        yield "delta", payload
+                elif kind == "done":
+                    if source == primary[0]:
+                        self.record_completion(source, time.monotonic() - started_at)
+                    if committed is None:
+                        committed = commit(source)
+                        yield "commit", source
+                        if buffers[source]:
+                            yield "delta", "".join(buffers[source])
+                    return
+                elif kind == "error":
+                    if committed == source or isinstance(payload, CallCancelledError):
+                        raise payload
+                    failures[source] = payload
+                    if alternate[0] not in contexts:
+                        launch(*alternate)
+                        yield "hedge", "error"
+                    elif len(failures) == len(contexts):
+                        raise failures[primary[0]]
+        finally:
+            for child in contexts.values():
+                child.cancel_token.cancel()
+
+    def _record_loss(self, agent_name: str, started_at: float, first_token: bool):
+        elapsed = time.monotonic() - started_at
+        if first_token:
+            self.record_first_token(agent_name, elapsed)
+        self.record_completion(agent_name, elapsed)
+
+    def _pump(self, name: str, agent: Agent, messages: List[Dict], ctx: CallContext, events: queue.Queue):
+        try:
+            stream = agent.complete_stream(messages, ctx)
+            try:
+                for chunk in stream:
+                    if ctx.cancelled:
+                        break
+                    events.put((name, "delta", chunk))
+            finally:
+                stream.close()
+            events.put((name, "done", None))
+        except Exception as exc:
+            events.put((name, "error", exc))
+
+    def complete(self, primary: Tuple[str, Agent], alternate: Tuple[str, Agent], messages: List[Dict],
+                 ctx: Optional[CallContext] = None) -> Tuple[str, str, bool]:
+        served_by, hedged, chunks = primary[0], False, []
+        for kind, payload in self.stream(primary, alternate, messages, ctx, first_token_wins=False):
+            if kind == "hedge":
+                hedged = True
+            elif kind == "commit":
+                served_by = payload
+            else:
+                chunks.append(payload)
+        return "".join(chunks), served_by, hedged
+
+    async def acomplete(self, primary: Tuple[str, Agent], alternate: Tuple[str, Agent], messages: List[Dict],
+                        ctx: Optional[CallContext] = None) -> Tuple[str, str, bool]:
+        tasks = {asyncio.ensure_future(primary[1].acomplete(messages, ctx)): primary[0]}
+        errors = {}
+        hedged = False
+        started_at = time.monotonic()
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.completion_threshold(primary[0]))
+            while True:
+                for task in done:
+                    name = tasks.pop(task)
+                    if task.exception() is None:
+                        if name == primary[0]:
+                            self.record_completion(name, time.monotonic() - started_at)
+                        elif primary[0] in tasks.values():
+                            self._record_loss(primary[0], started_at, first_token=False)
+                        return task.result(), name, hedged
+                    errors[name] = task.exception()
+                    if isinstance(errors[name], CallCancelledError):
+                        raise errors[name]
+
+                if not hedged:
+                    hedged = True
+                    tasks[asyncio.ensure_future(alternate[1].acomplete(messages, ctx))] = alternate[0]
+                if not tasks:
+                    raise errors.get(primary[0]) or next(iter(errors.values()))
+
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def parse_alternates(value: Optional[str]) -> Dict[str, str]:
+    alternates = {}
+    for pair in (value or "").split(","):
+        if ":" in pair:
+            agent_name, alternate = pair.split(":", 1)
+            alternates[agent_name.strip()] = alternate.strip()
+    return alternates
+
+
+def create_hedger(config) -> Optional[Hedger]:
+    if not config.get_bool('HEDGE_ENABLED'):
+        return None
+
+    return Hedger(
+        parse_alternates(config.get('HEDGE_ALTERNATES', 'chatgpt:groq,gemini:groq,groq:chatgpt')),
+        after_seconds=config.get_float('HEDGE_AFTER_SECONDS'),
+        default_after_seconds=config.get_float('HEDGE_DEFAULT_AFTER_SECONDS', 10.0)
+    )
@@ -0,0 +1,179 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+class MemoryConversationStore:
+    shared = False
+
+    def __init__(self, max_messages: int = 1000):
+        self.max_messages = max_messages
+        self._messages = {}
+        self._last_seq = {}
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def append(self, session_id: str, message: Dict) -> int:
+        with self._lock:
+            messages = self._messages.setdefault(session_id, [])
+            seq = self._last_seq.get(session_id, 0) + 1
+            self._last_seq[session_id] = seq
+            messages.append(dict(message, seq=seq))
+            if len(messages) > self.max_messages:
+                del messages[:len(messages) - self.max_messages]
+            return seq
+
+    def _select(self, session_id: str, since: int, limit: Optional[int]) -> List[Dict]:
+        messages = [msg for msg in self._messages.get(session_id, []) if msg["seq"] > since]
+        return messages if limit is None else messages[:limit]
+
+    def page(self, session_id: str, since: int = 0, limit: int = DEFAULT_PAGE_SIZE) -> List[Dict]:
+        with self._lock:
+            return self._select(session_id, since, limit)
+
+    def last_seq(self, session_id: str) -> int:
+        with self._lock:
+            return self._last_seq.get(session_id, 0)
+
+    def load(self, session_id: str) -> Tuple[Optional[Dict], List[Dict]]:
+        with self._lock:
+            state = self._state.get(session_id, {})
+            return state.get("summary"), self._select(session_id, state.get("summary_until", 0), None)
+
+    def save_summary(self, session_id: str, summary: Dict, until_seq: int):
+        with self._lock:
+            self._state.setdefault(session_id, {}).update(summary=summary, summary_until=until_seq)
+
+    def reset(self, session_id: str):
+        with self._lock:
+            self._messages.pop(session_id, None)
+            self._state.pop(session_id, None)
+
+    def delete_session(self, session_id: str):
+        with self._lock:
+            self._messages.pop(session_id, None)
+            self._last_seq.pop(session_id, None)
+            self._state.pop(session_id, None)
+
+
+class SQLiteConversationStore:
+    shared = True
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, agent TEXT NOT NULL, role TEXT NOT NULL, "
+            "message TEXT NOT NULL, timestamp TEXT NOT NULL, PRIMARY KEY (session_id, seq))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_state ("
+            "session_id TEXT PRIMARY KEY, reset_after INTEGER NOT NULL DEFAULT 0, "
+            "summary TEXT, summary_until INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.commit()
+
+    def _write(self, statements):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = statements()
+            self._conn.commit()
+            return result
+        except BaseException:
+            self._conn.rollback()
+            raise
+
+    def append(self, session_id: str, message: Dict) -> int:
+        def insert() -> int:
+            row = self._conn.execute("SELECT MAX(seq) FROM messages WHERE session_id = ?", (session_id,)).fetchone()
+            seq = (row[0] or 0) + 1
+            self._conn.execute(
+                "INSERT INTO messages (session_id, seq, agent, role, message, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, seq, message["agent"], message["role"], message["message"], message["timestamp"])
+            )
+            return seq
+
+        with self._lock:
+            return self._write(insert)
+
+    def _state(self, session_id: str) -> Tuple[int, Optional[Dict], int]:
+        row = self._conn.execute(
+            "SELECT reset_after, summary, summary_until FROM session_state WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return 0, None, 0
+        return row[0], json.loads(row[1]) if row[1] else None, row[2]
+
+    def _select(self, session_id: str, since: int, limit: Optional[int]) -> List[Dict]:
+        rows = self._conn.execute(
+            "SELECT seq, agent, role, message, timestamp FROM messages "
+            "WHERE session_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (session_id, since, -1 if limit is None else limit)
+        ).fetchall()
+        return [
+            {"seq": seq, "agent": agent, "role": role, "message": message, "timestamp": timestamp}
+            for seq, agent, role, message, timestamp in rows
+        ]
+
+    def page(self, session_id: str, since: int = 0, limit: int = DEFAULT_PAGE_SIZE) -> List[Dict]:
+        with self._lock:
+            reset_after, _, _ = self._state(session_id)
+            return self._select(session_id, max(since, reset_after), limit)
+
+    def last_seq(self, session_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(seq) FROM messages WHERE session_id = ?", (session_id,)).fetchone()
+            return row[0] or 0
+
+    def load(self, session_id: str) -> Tuple[Optional[Dict], List[Dict]]:
+        with self._lock:
+            reset_after, summary, summary_until = self._state(session_id)
+            return summary, self._select(session_id, max(reset_after, summary_until), None)
+
+    def save_summary(self, session_id: str, summary: Dict, until_seq: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO session_state (session_id, summary, summary_until) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary, summary_until = excluded.summary_until",
+                (session_id, json.dumps(summary), until_seq)
+            )
+            self._conn.commit()
+
+    def reset(self, session_id: str):
+        def mark():
+            row = self._conn.execute("SELECT MAX(seq) FROM messages WHERE session_id = ?", (session_id,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO session_state (session_id, reset_after, summary, summary_until) VALUES (?, ?, NULL, 0)",
+                (session_id, row[0] or 0)
+            )
+
+        with self._lock:
+            self._write(mark)
+
+    def delete_session(self, session_id: str):
+        def delete():
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM session_state WHERE session_id = ?", (session_id,))
+
+        with self._lock:
+            self._write(delete)
+
+
+def create_conversation_store(config):
+    if config.get('HISTORY_STORE', 'sqlite') == 'memory':
+        return MemoryConversationStore(config.get_int('HISTORY_MEMORY_MAX_MESSAGES', 1000))
+
+    path = Path(config.get('HISTORY_PATH', 'data/conversations.sqlite3'))
+    if not path.is_absolute():
+        path = Path(__file__).parent.parent / path
+    return SQLiteConversationStore(str(path))
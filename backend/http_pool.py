@@ -0,0 +1,53 @@
+import importlib.util
+import threading
+
+class HttpPool:
+    def __init__(self, max_connections: int = 100, max_keepalive: int = 20, keepalive_seconds: float = 30.0,
+                 http2: bool = True):
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_seconds = keepalive_seconds
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _options(self) -> dict:
+        import httpx
+        return {
+            "http2": self.http2,
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_seconds
+            )
+        }
+
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import httpx
+                    self._client = httpx.Client(**self._options())
+        return self._client
+
+    def async_client(self):
+        import httpx
+        return httpx.AsyncClient(**self._options())
+
+    def stats(self) -> dict:
+        return {"http2": self.http2, "max_connections": self.max_connections, "started": self._client is not None}
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+
+def create_http_pool(config) -> HttpPool:
+    return HttpPool(
+        max_connections=config.get_int('HTTP_MAX_CONNECTIONS', 100),
+        max_keepalive=config.get_int('HTTP_MAX_KEEPALIVE', 20),
+        keepalive_seconds=config.get_float('HTTP_KEEPALIVE_SECONDS', 30.0),
+        http2=config.get_bool('HTTP2_ENABLED', True)
+    )
@@ -0,0 +1,250 @@
+import itertools
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional
+from backend.call_context import CancelToken
+from backend.discussion import DiscussionError, parse_discussion_options, parse_discussion_rounds
+from backend.orchestrator import Orchestrator
+
+TERMINAL_STATES = {"succeeded", "failed", "cancelled"}
+PROGRESS_EVENT_TYPES = {"thinking", "message", "error", "hedge", "compaction", "cancelled", "skipped", "converged"}
+
+class JobError(ValueError):
+    pass
+
+
+class Job:
+    def __init__(self, kind: str, params: Dict, priority: int = 0, session_id: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.priority = priority
+        self.session_id = session_id
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.events = []
+        self.results = []
+        self.error = None
+        self.cancel_token = CancelToken()
+        self._cond = threading.Condition()
+
+    def add_event(self, event: Dict):
+        with self._cond:
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def set_status(self, status: str, error: Optional[str] = None):
+        with self._cond:
+            self.status = status
+            if status == "running":
+                self.started_at = time.time()
+            if status in TERMINAL_STATES:
+                self.finished_at = time.time()
+                self.error = error
+            self.events.append({"type": "status", "status": status, "error": error})
+            self._cond.notify_all()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATES
+
+    def follow(self, since: int = 0, timeout: float = 15.0) -> Iterator[Optional[Dict]]:
+        index = since
+        while True:
+            with self._cond:
+                if index >= len(self.events) and not self.finished:
+                    self._cond.wait(timeout)
+                pending = self.events[index:]
+                finished = self.finished
+            if not pending and not finished:
+                yield None
+            for event in pending:
+                index += 1
+                yield dict(event, index=index)
+            if finished and index >= len(self.events):
+                return
+
+    def to_dict(self, include_results: bool = True) -> Dict:
+        job = {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "priority": self.priority,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress_events": len(self.events),
+            "error": self.error
+        }
+        if include_results:
+            job["results"] = self.results
+        return job
+
+
+class JobQueue:
+    def __init__(self, factory: Callable[[str], Orchestrator], workers: int = 2, max_queued: int = 1000,
+                 retention: int = 1000):
+        self.factory = factory
+        self.workers = workers
+        self.max_queued = max_queued
+        self.retention = retention
+        self.jobs = OrderedDict()
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def submit(self, kind: str, params: Dict, priority: int = 0, session_id: Optional[str] = None) -> Job:
+        return self.submit_many([{"kind": kind, "params": params, "priority": priority}], session_id)[0]
+
+    def submit_many(self, specs: List[Dict], session_id: Optional[str] = None) -> List[Job]:
+        jobs = [Job(spec["kind"], spec["params"], spec.get("priority", 0), session_id) for spec in specs]
+        with self._lock:
+            if self.queued() + len(jobs) > self.max_queued:
+                raise JobError(f"Job queue is full ({self.max_queued} queued jobs)")
+            for job in jobs:
+                self.jobs[job.id] = job
+            self._evict_finished()
+            self._start_workers()
+        for job in jobs:
+            self._queue.put((-job.priority, next(self._sequence), job))
+        return jobs
+
+    def get(self, job_id: str, session_id: Optional[str] = None) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        return job if job is not None and (session_id is None or job.session_id == session_id) else None
+
+    def list(self, session_id: Optional[str] = None) -> List[Job]:
+        return [job for job in list(self.jobs.values()) if session_id is None or job.session_id == session_id]
+
+    def queued(self) -> int:
+        return sum(1 for job in list(self.jobs.values()) if job.status == "queued")
+
+    def cancel(self, job_id: str, session_id: Optional[str] = None) -> Optional[Job]:
+        job = self.get(job_id, session_id)
+        if job is None or job.finished:
+            return job
+        job.cancel_token.cancel()
+        with self._lock:
+            if job.status == "queued":
+                job.set_status("cancelled")
+        return job
+
+    def _evict_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(self.jobs) - self.retention)]:
+            del self.jobs[job_id]
+
+    def _work(self):
+        while True:
+            _, _, job = self._queue.get()
+            with self._lock:
+                if job.status != "queued":
+                    continue
+                job.set_status("running")
+            try:
+                self._run(job)
+            except Exception as e:
+                job.set_status("failed", str(e))
+
+    def _run(self, job: Job):
+        orchestrator = self.factory(f"job-{job.id}")
+        try:
+            self._drive(orchestrator, job)
+        finally:
+            orchestrator.release()
+
+    def _drive(self, orchestrator: Orchestrator, job: Job):
+        orchestrator.begin_run(job.cancel_token)
+        events = self._events(orchestrator, job)
+        try:
+            for event in events:
+                if job.cancel_token.cancelled:
+                    job.set_status("cancelled")
+                    return
+                if event["type"] not in PROGRESS_EVENT_TYPES:
+                    continue
+                job.add_event(event)
+                if event["type"] == "message":
+                    job.results.append({
+                        "success": True,
+                        "agent": event["agent"],
+                        "role": event.get("role"),
+                        "node": event.get("node"),
+                        "response": event["message"]
+                    })
+                elif event["type"] == "error":
+                    job.results.append({
+                        "success": False,
+                        "agent": event.get("agent"),
+                        "role": event.get("role"),
+                        "node": event.get("node"),
+                        "error": event.get("error")
+                    })
+        finally:
+            events.close()
+
+        if job.cancel_token.cancelled:
+            job.set_status("cancelled")
+        elif job.results and not any(result["success"] for result in job.results):
+            job.set_status("failed", "Every agent call failed")
+        else:
+            job.set_status("succeeded")
+
+    def _events(self, orchestrator: Orchestrator, job: Job) -> Iterator[Dict]:
+        if job.kind == "workflow":
+            workflow = orchestrator.get_workflow(job.params.get("workflow"))
+            orchestrator.add_message("User", job.params["request"])
+            return orchestrator.stream_workflow(workflow, job.params["request"])
+
+        topic = job.params["topic"]
+        orchestrator.add_message("User", f"Discussion topic: {topic}")
+        return orchestrator.stream_discussion(topic, job.params.get("rounds", 2), options=job.params.get("options"))
+
+
+def parse_job_request(data: Dict, orchestrator: Orchestrator) -> Dict:
+    kind = data.get("type", "workflow")
+    priority = data.get("priority", 0)
+    if not isinstance(priority, int):
+        raise JobError("'priority' must be an integer")
+
+    if kind == "workflow":
+        if not data.get("request"):
+            raise JobError("Missing 'request' for workflow job")
+        if orchestrator.get_workflow(data.get("workflow")) is None:
+            raise JobError(f"Unknown workflow '{data.get('workflow')}'. Available workflows: {list(orchestrator.workflows)}")
+        params = {"request": data["request"], "workflow": data.get("workflow") or "sequential"}
+    elif kind == "discussion":
+        if not data.get("topic"):
+            raise JobError("Missing 'topic' for discussion job")
+        try:
+            rounds = parse_discussion_rounds(data)
+            options = parse_discussion_options(data)
+        except DiscussionError as e:
+            raise JobError(str(e))
+        params = {"topic": data["topic"], "rounds": rounds, "options": options}
+    else:
+        raise JobError(f"Unknown job type '{kind}'. Use 'workflow' or 'discussion'")
+
+    return {"kind": kind, "params": params, "priority": priority}
+
+
+def create_job_queue(config, factory: Callable[[str], Orchestrator]) -> JobQueue:
+    return JobQueue(
+        factory,
+        workers=config.get_int('JOB_WORKERS', 2),
+        max_queued=config.get_int('JOB_MAX_QUEUED', 1000),
+        retention=config.get_int('JOB_RETENTION', 1000)
+    )
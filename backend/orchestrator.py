@@ -1,47 +1,244 @@
-from typing import List, Dict, Optional
-from backend.agents import ChatGPTAgent, GeminiAgent, GroqAgent
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Dict, Optional, Iterator, Tuple
+from backend.agents import Agent, ChatGPTAgent, GeminiAgent, GroqAgent
+from backend.artifacts import ArtifactIndex, CodeBlockParser, extract_code_blocks
 from backend.config_loader import ConfigLoader
+from backend.discussion import DiscussionScheduler
+from backend.compaction import Compactor
+from backend.cache import ResponseCache, create_response_cache
+from backend.call_context import CallContext, CancelToken
+from backend.hedging import Hedger, create_hedger
+from backend.http_pool import create_http_pool
+from backend.history import DEFAULT_PAGE_SIZE, create_conversation_store
+from backend.metrics import AGENT_CALL_SECONDS
+from backend.rate_limit import create_limiter
+from backend.resilience import ProviderError, classify_error, create_guard
+from backend.startup import startup
+from backend.state import StateBackend, create_state_backend
+from backend.tracing import Trace
+from backend.workflows import Workflow, WorkflowRun, load_workflows
 
 class Orchestrator:
-    def __init__(self):
-        self.config = ConfigLoader()
+    def __init__(self, config: Optional[ConfigLoader] = None, agents: Optional[Dict[str, Agent]] = None,
+                 cache: Optional[ResponseCache] = None, session_id: Optional[str] = None,
+                 hedger: Optional[Hedger] = None, workflows: Optional[Dict[str, Workflow]] = None,
+                 history_store=None, state: Optional[StateBackend] = None):
+        self.config = config or ConfigLoader()
+        self.session_id = session_id
         self.agents = {}
+        self.cache = cache
+        self.hedger = hedger
+        self.workflows = workflows
+        self.history_store = history_store
+        self.state = state
+        self.max_parallel_nodes = self.config.get_int('WORKFLOW_MAX_PARALLEL', 4)
         self.conversation_history = []
+        self.summary = None
         self.project_state = {
             "phase": "planning",
-            "artifacts": {}
+            "artifacts": ArtifactIndex()
         }
-        self._initialize_agents()
+        self.compactor = Compactor(
+            max_messages=self.config.get_int('COMPACT_AFTER_MESSAGES', 20),
+            keep_recent=self.config.get_int('COMPACT_KEEP_RECENT', 6),
+            input_tokens=self.config.get_int('COMPACT_INPUT_TOKENS', 6000),
+            preferred_agent=self.config.get('SUMMARY_AGENT', 'groq')
+        )
+        self._compaction_lock = threading.Lock()
+        self._history_lock = threading.Lock()
+        self.cancel_token = CancelToken()
+        if self.state is None:
+            with startup.phase("state_backend"):
+                self.state = create_state_backend(self.config)
+        if agents is None:
+            with startup.phase("agents"):
+                self._initialize_agents()
+            with startup.phase("response_cache"):
+                self.cache = create_response_cache(self.config)
+            self.hedger = create_hedger(self.config)
+        else:
+            self.agents = agents
+        if self.workflows is None:
+            with startup.phase("workflows"):
+                self.workflows = load_workflows(self.config)
+        if self.history_store is None:
+            with startup.phase("history_store"):
+                self.history_store = create_conversation_store(self.config)
+        self.summary, self.conversation_history = self.history_store.load(self.history_key)
+
+    def spawn(self, session_id: Optional[str] = None) -> "Orchestrator":
+        return type(self)(config=self.config, agents=self.agents, cache=self.cache, session_id=session_id,
+                          hedger=self.hedger, workflows=self.workflows, history_store=self.history_store,
+                          state=self.state)
+
+    @property
+    def history_key(self) -> str:
+        return self.session_id or "default"
+
+    def call_context(self) -> CallContext:
+        return CallContext(self.session_id, self.cancel_token)
+
+    def refresh(self):
+        if self.history_store.shared:
+            with self._history_lock:
+                self.summary, self.conversation_history = self.history_store.load(self.history_key)
+
+    def begin_run(self, cancel_token: Optional[CancelToken] = None) -> CancelToken:
+        self.refresh()
+        self.cancel_token = cancel_token or CancelToken()
+        return self.cancel_token
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_token.cancelled
 
     def _initialize_agents(self):
+        pool = create_http_pool(self.config)
+
         if self.config.get('OPENAI_API_KEY'):
             self.agents['chatgpt'] = ChatGPTAgent(
                 api_key=self.config.get('OPENAI_API_KEY'),
-                model=self.config.get('OPENAI_MODEL')
+                model=self.config.get('OPENAI_MODEL'),
+                context_tokens=self.config.get_int('OPENAI_CONTEXT_TOKENS'),
+                guard=create_guard(self.config, 'OPENAI', 'ChatGPT', create_limiter(self.config, 'OPENAI', 'ChatGPT', self.state)),
+                pool=pool
             )
 
         if self.config.get('GOOGLE_API_KEY'):
             self.agents['gemini'] = GeminiAgent(
                 api_key=self.config.get('GOOGLE_API_KEY'),
-                model=self.config.get('GOOGLE_MODEL')
+                model=self.config.get('GOOGLE_MODEL'),
+                context_tokens=self.config.get_int('GOOGLE_CONTEXT_TOKENS'),
+                guard=create_guard(self.config, 'GOOGLE', 'Gemini', create_limiter(self.config, 'GOOGLE', 'Gemini', self.state))
             )
 
         if self.config.get('GROQ_API_KEY'):
             self.agents['groq'] = GroqAgent(
                 api_key=self.config.get('GROQ_API_KEY'),
-                model=self.config.get('GROQ_MODEL')
+                model=self.config.get('GROQ_MODEL'),
+                context_tokens=self.config.get_int('GROQ_CONTEXT_TOKENS'),
+                guard=create_guard(self.config, 'GROQ', 'Groq', create_limiter(self.config, 'GROQ', 'Groq', self.state)),
+                pool=pool
             )
 
     def get_available_agents(self) -> List[str]:
         return list(self.agents.keys())
 
-    def add_message(self, agent_name: str, message: str):
-        self.conversation_history.append({
+    @property
+    def artifacts(self) -> ArtifactIndex:
+        return self.project_state["artifacts"]
+
+    def add_message(self, agent_name: str, message: str) -> int:
+        msg = {
             "agent": agent_name,
             "role": self.agents.get(agent_name).role if agent_name in self.agents else "User",
             "message": message,
             "timestamp": self._get_timestamp()
-        })
+        }
+        with self._history_lock:
+            msg["seq"] = self.history_store.append(self.history_key, msg)
+            self.conversation_history.append(msg)
+        return msg["seq"]
+
+    def index_artifacts(self, seq: int, agent_name: str, blocks: List[Dict]) -> List[Dict]:
+        return [
+            {"key": artifact["key"], "version": artifact["version"], "etag": artifact["etag"]}
+            for artifact in self.artifacts.record(seq, agent_name, blocks)
+        ]
+
+    def sync_artifacts(self) -> ArtifactIndex:
+        self.artifacts.sync(self.history_store, self.history_key)
+        return self.artifacts
+
+    def agent_context(self) -> List[Dict]:
+        with self._history_lock:
+            return ([self.summary] if self.summary else []) + self.conversation_history
+
+    def compact(self) -> bool:
+        if not self.compactor.should_compact(self.conversation_history):
+            return False
+
+        agent_name = self.compactor.pick_agent(self.agents)
+        if agent_name is None or not self._compaction_lock.acquire(blocking=False):
+            return False
+
+        try:
+            folded, _ = self.compactor.split(self.conversation_history)
+            text = self.agents[agent_name].call(self.compactor.prompt(self.summary, folded), [], self.call_context())
+            return self._apply_compaction(text, folded)
+        except ProviderError:
+            return False
+        finally:
+            self._compaction_lock.release()
+
+    def _apply_compaction(self, text: str, folded: List[Dict]) -> bool:
+        if not text or not folded:
+            return False
+
+        through = folded[-1]["seq"]
+        with self._history_lock:
+            self.summary = self.compactor.summary_message(text, self.summary, folded)
+            self.conversation_history = [msg for msg in self.conversation_history if msg["seq"] > through]
+            self.history_store.save_summary(self.history_key, self.summary, through)
+        return True
+
+    def _cache_key(self, agent: Agent, messages: List[Dict]) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return ResponseCache.key(agent.name, agent.model, messages, agent.temperature, agent.max_tokens)
+
+    def _cached_response(self, key: Optional[str]) -> Optional[str]:
+        return self.cache.get(key) if key else None
+
+    def _store_response(self, key: Optional[str], response: str):
+        if key and response:
+            self.cache.set(key, response)
+
+    def _alternate(self, agent_name: str) -> Optional[Tuple[str, Agent]]:
+        if self.hedger is None:
+            return None
+        alternate = self.hedger.alternate_for(agent_name, self.agents)
+        return (alternate, self.agents[alternate]) if alternate else None
+
+    def _respond(self, agent_name: str, messages: List[Dict]) -> Tuple[str, Dict]:
+        agent = self.agents[agent_name]
+        ctx = self.call_context()
+        key = self._cache_key(agent, messages)
+        cached = self._cached_response(key)
+        if cached is not None:
+            return cached, {"cached": True, "served_by": agent_name, "hedged": False, "usage": ctx.usage}
+
+        alternate = self._alternate(agent_name)
+        if alternate is None:
+            response, served_by, hedged = agent.complete(messages, ctx), agent_name, False
+        else:
+            response, served_by, hedged = self.hedger.complete((agent_name, agent), alternate, messages, ctx)
+
+        if served_by == agent_name:
+            self._store_response(key, response)
+        return response, {"cached": False, "served_by": served_by, "hedged": hedged, "usage": ctx.usage}
+
+    def _observe_turn(self, agent_name: str, mode: str, started: float, outcome: str):
+        AGENT_CALL_SECONDS.observe(time.perf_counter() - started, agent=agent_name, mode=mode, outcome=outcome)
+
+    @staticmethod
+    def _error_outcome(error: ProviderError) -> str:
+        return "cancelled" if error.kind == "cancelled" else "error"
+
+    def _error_result(self, agent_name: str, agent: Agent, error: ProviderError) -> Dict:
+        return {
+            "success": False,
+            "agent": agent_name,
+            "role": agent.role,
+            "error": str(error),
+            "error_detail": error.to_dict()
+        }
 
     def call_agent(self, agent_name: str, prompt: str) -> Dict:
         if agent_name not in self.agents:
@@ -51,64 +248,279 @@ class Orchestrator:
             }
 
         agent = self.agents[agent_name]
+        started = time.perf_counter()
 
-        response = agent.call(prompt, self.conversation_history)
+        try:
+            response, delivery = self._respond(agent_name, agent.build_messages(prompt, self.agent_context()))
+        except ProviderError as e:
+            self._observe_turn(agent_name, "call", started, self._error_outcome(e))
+            return self._error_result(agent_name, agent, e)
 
-        self.add_message(agent_name, response)
+        seq = self.add_message(agent_name, response)
+        artifacts = self.index_artifacts(seq, agent_name, extract_code_blocks(response))
+        self.compact()
+        self._observe_turn(agent_name, "call", started, "cached" if delivery["cached"] else "success")
 
         return {
             "success": True,
             "agent": agent_name,
             "role": agent.role,
             "response": response,
-            "conversation": self.conversation_history
+            **delivery,
+            "seq": seq,
+            "artifacts": artifacts
         }
 
-    def run_sequential_workflow(self, user_request: str) -> List[Dict]:
-        workflow_steps = []
+    def stream_agent(self, agent_name: str, prompt: str) -> Iterator[Dict]:
+        if agent_name not in self.agents:
+            yield {
+                "type": "error",
+                "agent": agent_name,
+                "error": f"Agent '{agent_name}' not available. Available agents: {self.get_available_agents()}"
+            }
+            return
 
+        agent = self.agents[agent_name]
+        started = time.perf_counter()
+        ctx = self.call_context()
+
+        messages = agent.build_messages(prompt, self.agent_context())
+        key = self._cache_key(agent, messages)
+        response = self._cached_response(key)
+        cached = response is not None
+        served_by, hedged = agent_name, False
+
+        parser = CodeBlockParser()
+        if not cached:
+            chunks = []
+            try:
+                for kind, payload in self._stream_deltas(agent_name, messages, ctx):
+                    if kind == "hedge":
+                        hedged = True
+                        yield {"type": "hedge", "agent": agent_name, "alternate": self.hedger.alternates[agent_name], "reason": payload}
+                    elif kind == "commit":
+                        served_by = payload
+                    else:
+                        chunks.append(payload)
+                        yield {"type": "delta", "agent": agent_name, "delta": payload}
+                        for block in parser.feed(payload):
+                            yield {"type": "artifact", "agent": agent_name, **block}
+            except ProviderError as e:
+                self._observe_turn(agent_name, "stream", started, self._error_outcome(e))
+                if e.kind == "cancelled":
+                    yield {"type": "cancelled", "agent": agent_name, "role": agent.role}
+                else:
+                    yield {"type": "error", "agent": agent_name, "role": agent.role, "error": str(e), "error_detail": e.to_dict()}
+                return
+
+            response = "".join(chunks)
+            if served_by == agent_name:
+                self._store_response(key, response)
+        else:
+            for block in parser.feed(response):
+                yield {"type": "artifact", "agent": agent_name, **block}
+        for block in parser.close():
+            yield {"type": "artifact", "agent": agent_name, **block}
+
+        seq = self.add_message(agent_name, response)
+
+        yield {
+            "type": "message",
+            "agent": agent_name,
+            "role": agent.role,
+            "message": response,
+            "seq": seq,
+            "artifacts": self.index_artifacts(seq, agent_name, parser.blocks),
+            "cached": cached,
+            "served_by": served_by,
+            "hedged": hedged,
+            "usage": ctx.usage
+        }
+
+        if self.compact():
+            yield {"type": "compaction", "covers": self.summary["covers"]}
+        self._observe_turn(agent_name, "stream", started, "cached" if cached else "success")
+
+    def _stream_deltas(self, agent_name: str, messages: List[Dict], ctx: CallContext) -> Iterator[Tuple[str, object]]:
+        alternate = self._alternate(agent_name)
+        if alternate is None:
+            for delta in self.agents[agent_name].complete_stream(messages, ctx):
+                yield "delta", delta
+            return
+
+        yield from self.hedger.stream((agent_name, self.agents[agent_name]), alternate, messages, ctx)
+
+    def get_workflow(self, name: Optional[str] = None) -> Optional[Workflow]:
+        return self.workflows.get(name or "sequential")
+
+    def run_workflow(self, workflow: Workflow, user_request: str) -> List[Dict]:
         self.add_message("User", user_request)
 
-        agent_sequence = [
-            ("chatgpt", f"As a Product Manager, analyze this request and create a detailed technical specification with key features and tech stack recommendations: {user_request}"),
-            ("gemini", "As a Full-Stack Developer, based on the specification above, write actual code snippets for the key components. Include both frontend (HTML/JS) and backend (Python/Node.js) code. Keep each code block concise but functional."),
-            ("groq", "As a QA Engineer, review the specification and code above. Suggest test cases, potential bugs to watch for, and quality improvements. Provide examples of unit tests if applicable.")
-        ]
+        run = WorkflowRun(workflow, user_request, self.agents)
+        results = {}
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_parallel_nodes) as pool:
+            while True:
+                for node in [] if self.cancelled else run.ready():
+                    running[pool.submit(self.call_agent, node.agent, run.prompt(node))] = node
+                if not running:
+                    break
 
-        for agent_name, task in agent_sequence:
-            if agent_name in self.agents:
-                result = self.call_agent(agent_name, task)
-                workflow_steps.append(result)
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = self._error_result(node.agent, self.agents[node.agent], classify_error(node.agent, e))
+                    results[node.id] = dict(result, node=node.id)
+                    run.finish(node.id, results[node.id].get("response"))
 
-        return workflow_steps
+        return [results[node.id] for node in workflow.nodes if node.id in results]
 
-    def run_round_robin_discussion(self, topic: str, rounds: int = 2) -> List[Dict]:
-        discussion_steps = []
+    def run_sequential_workflow(self, user_request: str) -> List[Dict]:
+        return self.run_workflow(self.get_workflow("sequential"), user_request)
 
-        self.add_message("User", f"Discussion topic: {topic}")
+    def stream_workflow(self, workflow: Workflow, user_request: str, trace: Optional[Trace] = None) -> Iterator[Dict]:
+        run = WorkflowRun(workflow, user_request, self.agents)
+        events = queue.Queue()
+        stop = threading.Event()
+        waiting = []
+        running = 0
 
-        available = self.get_available_agents()
+        def pump(node, prompt: str):
+            output = None
+            stream = self.stream_agent(node.agent, prompt)
+            if trace is not None:
+                stream = trace.follow(node.id, stream)
+            try:
+                for event in stream:
+                    if stop.is_set():
+                        break
+                    if event["type"] == "message":
+                        output = event["message"]
+                    events.put((node, dict(event, node=node.id), None))
+            except Exception as e:
+                events.put((node, {"type": "error", "agent": node.agent, "node": node.id, "error": str(e)}, None))
+            finally:
+                stream.close()
+                events.put((node, None, output))
 
-        for round_num in range(rounds):
-            for agent_name in available:
-                if round_num == 0:
-                    prompt = f"Share your perspective on: {topic}"
+        try:
+            while True:
+                if self.cancelled:
+                    waiting.clear()
                 else:
-                    prompt = f"Respond to the previous comments and add your thoughts."
+                    waiting.extend(run.ready())
+                while waiting and running < self.max_parallel_nodes:
+                    node = waiting.pop(0)
+                    running += 1
+                    yield {"type": "thinking", "agent": node.agent, "role": self.agents[node.agent].role, "node": node.id}
+                    threading.Thread(target=pump, args=(node, run.prompt(node)), daemon=True).start()
+                if not running:
+                    return
 
-                result = self.call_agent(agent_name, prompt)
-                discussion_steps.append(result)
+                item = events.get()
+                if item[1] is not None:
+                    yield item[1]
+                    continue
+
+                running -= 1
+                run.finish(item[0].id, item[2])
+        finally:
+            stop.set()
+
+    def discussion_scheduler(self, rounds: int, options: Optional[Dict] = None) -> DiscussionScheduler:
+        options = options or {}
+        return DiscussionScheduler(
+            self.get_available_agents(),
+            rounds,
+            roles={name: agent.role for name, agent in self.agents.items()},
+            adaptive=options.get("mode", self.config.get('DISCUSSION_MODE', 'fixed')) == "adaptive",
+            order=options.get("order", self.config.get('DISCUSSION_ORDER', 'rotation')),
+            threshold=options.get("novelty_threshold", self.config.get_float('DISCUSSION_NOVELTY_THRESHOLD', 0.3)),
+            patience=self.config.get_int('DISCUSSION_PATIENCE', 1)
+        )
+
+    def _skipped_turn(self, turn: Dict) -> Dict:
+        if turn["type"] == "skipped":
+            return dict(turn, role=self.agents[turn["agent"]].role)
+        return turn
+
+    @staticmethod
+    def discussion_prompt(topic: str, round_num: int) -> str:
+        if round_num == 1:
+            return f"Share your perspective on: {topic}"
+        return f"Respond to the previous comments and add your thoughts on round {round_num}."
+
+    def _discussion_step(self, scheduler: DiscussionScheduler, turn: Dict, result: Dict) -> Dict:
+        if result.get("success"):
+            result = dict(result, novelty=scheduler.record(turn["agent"], result["response"]))
+        return dict(result, round=turn["round"])
+
+    def stream_discussion(self, topic: str, rounds: int = 2, trace: Optional[Trace] = None,
+                          options: Optional[Dict] = None) -> Iterator[Dict]:
+        scheduler = self.discussion_scheduler(rounds, options)
+        for turn in scheduler.turns():
+            if self.cancelled:
+                return
+            if turn["type"] != "turn":
+                yield self._skipped_turn(turn)
+                continue
+
+            agent_name, round_num = turn["agent"], turn["round"]
+            yield {"type": "thinking", "agent": agent_name, "role": self.agents[agent_name].role}
+
+            events = self.stream_agent(agent_name, self.discussion_prompt(topic, round_num))
+            if trace is not None:
+                events = trace.follow(f"{agent_name}:round{round_num}", events)
+            for event in events:
+                if event["type"] == "message":
+                    event = dict(event, round=round_num, novelty=scheduler.record(agent_name, event["message"]))
+                yield event
+
+    def run_round_robin_discussion(self, topic: str, rounds: int = 2, options: Optional[Dict] = None) -> List[Dict]:
+        discussion_steps = []
+
+        self.add_message("User", f"Discussion topic: {topic}")
+
+        scheduler = self.discussion_scheduler(rounds, options)
+        for turn in scheduler.turns():
+            if self.cancelled:
+                return discussion_steps
+            if turn["type"] != "turn":
+                discussion_steps.append(dict(self._skipped_turn(turn), success=True))
+                continue
+
+            result = self.call_agent(turn["agent"], self.discussion_prompt(topic, turn["round"]))
+            discussion_steps.append(self._discussion_step(scheduler, turn, result))
 
         return discussion_steps
 
     def get_conversation_history(self) -> List[Dict]:
         return self.conversation_history
 
+    def get_history_page(self, since: int = 0, limit: int = DEFAULT_PAGE_SIZE) -> List[Dict]:
+        return self.history_store.page(self.history_key, since, limit)
+
+    def last_seq(self) -> int:
+        return self.history_store.last_seq(self.history_key)
+
+    def get_summary(self) -> Optional[Dict]:
+        return self.summary
+
+    def release(self):
+        if not self.history_store.shared:
+            self.history_store.delete_session(self.history_key)
+
     def reset(self):
-        self.conversation_history = []
+        with self._history_lock:
+            self.history_store.reset(self.history_key)
+            self.conversation_history = []
+            self.summary = None
         self.project_state = {
             "phase": "planning",
-            "artifacts": {}
+            "artifacts": ArtifactIndex()
         }
 
     def _get_timestamp(self) -> str:
@@ -121,10 +533,13 @@ class Orchestrator:
                 {
                     "name": name,
                     "role": agent.role,
-                    "model": agent.model
+                    "model": agent.model,
+                    "circuit": agent.guard.breaker.state,
+                    "rate_limit": agent.guard.limiter.stats() if agent.guard.limiter else None
                 }
                 for name, agent in self.agents.items()
             ],
             "conversation_length": len(self.conversation_history),
+            "summarized_messages": self.summary["covers"] if self.summary else 0,
             "project_phase": self.project_state["phase"]
         }
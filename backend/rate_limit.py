@@ -0,0 +1,154 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+from backend.call_context import CancelToken
+from backend.metrics import PROVIDER_QUEUE_WAIT_SECONDS
+from backend.resilience import CallCancelledError, ProviderError
+from backend.state import MemoryStateBackend, StateBackend
+
+class ProviderLimiter:
+    def __init__(self, provider: str, rpm: Optional[int] = None, tpm: Optional[int] = None,
+                 max_in_flight: int = 16, queue_timeout: float = 120.0, state: Optional[StateBackend] = None):
+        self.provider = provider
+        self.rpm = rpm
+        self.tpm = tpm
+        self.state = state or MemoryStateBackend()
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()
+
+    def _enqueue(self, session_id: str) -> object:
+        ticket = object()
+        self._queues.setdefault(session_id, deque()).append(ticket)
+        return ticket
+
+    def _dequeue(self, session_id: str, ticket: object):
+        queue = self._queues.get(session_id)
+        if queue is None:
+            return
+        if ticket in queue:
+            queue.remove(ticket)
+        if queue:
+            self._queues.move_to_end(session_id)
+        else:
+            del self._queues[session_id]
+
+    def _try_grant(self, session_id: str, ticket: object, tokens: int) -> Optional[float]:
+        head_session, head_queue = next(iter(self._queues.items()))
+        if head_session != session_id or head_queue[0] is not ticket:
+            return None
+        if self.in_flight >= self.max_in_flight:
+            return None
+
+        buckets = []
+        if self.rpm:
+            buckets.append((f"{self.provider}:requests", 1, self.rpm))
+        if self.tpm:
+            buckets.append((f"{self.provider}:tokens", tokens, self.tpm))
+        wait = self.state.reserve(buckets) if buckets else 0.0
+        if wait > 0:
+            return wait
+
+        self.in_flight += 1
+        self._dequeue(session_id, ticket)
+        self._cond.notify_all()
+        return 0.0
+
+    def _timeout_error(self) -> ProviderError:
+        return ProviderError(
+            self.provider,
+            f"waited more than {self.queue_timeout:.0f}s for client-side rate limit capacity",
+            kind="queue_timeout"
+        )
+
+    def _release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    @contextmanager
+    def acquire(self, session_id: str, tokens: int = 0, cancel_token: Optional[CancelToken] = None):
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        unregister = cancel_token.on_cancel(self._wake) if cancel_token is not None else None
+        try:
+            with self._cond:
+                ticket = self._enqueue(session_id)
+                while True:
+                    if cancel_token is not None and cancel_token.cancelled:
+                        self._dequeue(session_id, ticket)
+                        self._cond.notify_all()
+                        raise CallCancelledError(self.provider)
+                    wait = self._try_grant(session_id, ticket, tokens)
+                    if wait == 0:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._dequeue(session_id, ticket)
+                        self._cond.notify_all()
+                        raise self._timeout_error()
+                    self._cond.wait(min(wait, remaining) if wait else remaining)
+        finally:
+            if unregister is not None:
+                unregister()
+        PROVIDER_QUEUE_WAIT_SECONDS.observe(time.monotonic() - started, provider=self.provider)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aacquire(self, session_id: str, tokens: int = 0, cancel_token: Optional[CancelToken] = None):
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        with self._cond:
+            ticket = self._enqueue(session_id)
+        try:
+            while True:
+                if cancel_token is not None and cancel_token.cancelled:
+                    raise CallCancelledError(self.provider)
+                with self._cond:
+                    wait = self._try_grant(session_id, ticket, tokens)
+                if wait == 0:
+                    break
+                if time.monotonic() >= deadline:
+                    raise self._timeout_error()
+                await asyncio.sleep(min(wait, 0.05) if wait else 0.05)
+        except BaseException:
+            with self._cond:
+                self._dequeue(session_id, ticket)
+                self._cond.notify_all()
+            raise
+        PROVIDER_QUEUE_WAIT_SECONDS.observe(time.monotonic() - started, provider=self.provider)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "in_flight": self.in_flight,
+                "queued": sum(len(queue) for queue in self._queues.values()),
+                "queued_sessions": len(self._queues)
+            }
+
+
+def create_limiter(config, prefix: str, provider: str, state: Optional[StateBackend] = None) -> ProviderLimiter:
+    return ProviderLimiter(
+        provider,
+        rpm=config.get_int(f'{prefix}_RPM'),
+        tpm=config.get_int(f'{prefix}_TPM'),
+        max_in_flight=config.get_int(f'{prefix}_MAX_IN_FLIGHT', config.get_int('PROVIDER_MAX_IN_FLIGHT', 16)),
+        queue_timeout=config.get_float('RATE_LIMIT_QUEUE_TIMEOUT_SECONDS', 120.0),
+        state=state
+    )
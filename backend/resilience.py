@@ -0,0 +1,355 @@
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, ContextManager, Dict, Iterator, Optional
+from backend.call_context import CallContext
+from backend.metrics import PROVIDER_ATTEMPTS, PROVIDER_CALL_SECONDS, PROVIDER_ERRORS, PROVIDER_FIRST_TOKEN_SECONDS
+
+if TYPE_CHECKING:
+    from backend.rate_limit import ProviderLimiter
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+class ProviderError(Exception):
+    def __init__(self, provider: str, message: str, kind: str = "error",
+                 status: Optional[int] = None, retryable: bool = False):
+        super().__init__(message)
+        self.provider = provider
+        self.message = message
+        self.kind = kind
+        self.status = status
+        self.retryable = retryable
+
+    def __str__(self) -> str:
+        return f"Error calling {self.provider}: {self.message}"
+
+    def to_dict(self) -> Dict:
+        return {
+            "provider": self.provider,
+            "kind": self.kind,
+            "status": self.status,
+            "retryable": self.retryable,
+            "message": self.message
+        }
+
+
+class CircuitOpenError(ProviderError):
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(provider, f"circuit open after repeated failures, retry in {retry_after:.0f}s", kind="circuit_open")
+        self.retry_after = retry_after
+
+
+class CallCancelledError(ProviderError):
+    def __init__(self, provider: str):
+        super().__init__(provider, "call cancelled", kind="cancelled")
+
+
+def classify_error(provider: str, exc: Exception) -> ProviderError:
+    if isinstance(exc, ProviderError):
+        return exc
+
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status is None and isinstance(getattr(exc, "code", None), int):
+        status = exc.code
+
+    name = type(exc).__name__
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError)) or "Timeout" in name or "DeadlineExceeded" in name:
+        return ProviderError(provider, str(exc) or "request timed out", kind="timeout", status=status, retryable=True)
+    if "Connection" in name or "ServiceUnavailable" in name:
+        return ProviderError(provider, str(exc), kind="connection", status=status, retryable=True)
+    if status == 429 or "RateLimit" in name or "ResourceExhausted" in name:
+        return ProviderError(provider, str(exc), kind="rate_limited", status=status, retryable=True)
+    if status is not None and status >= 500:
+        return ProviderError(provider, str(exc), kind="server_error", status=status, retryable=True)
+    if status is not None:
+        return ProviderError(provider, str(exc), kind="client_error", status=status, retryable=status in RETRYABLE_STATUS)
+    return ProviderError(provider, str(exc))
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, error: ProviderError, attempt: int) -> bool:
+        return error.retryable and attempt + 1 < self.max_attempts
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def before_call(self) -> Optional[float]:
+        with self._lock:
+            if self.opened_at is None:
+                return None
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < self.reset_timeout:
+                return self.reset_timeout - elapsed
+            if self._probing:
+                return self.reset_timeout
+            self._probing = True
+            return None
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def cancel_probe(self):
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class ProviderGuard:
+    def __init__(self, provider: str, timeout: float = 60.0, retry: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None, limiter: Optional["ProviderLimiter"] = None):
+        self.provider = provider
+        self.timeout = timeout
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter
+
+    def _permit(self, ctx: Optional[CallContext], tokens: int):
+        if self.limiter is None:
+            return nullcontext()
+        ctx = ctx or CallContext()
+        return self.limiter.acquire(ctx.session_id, tokens, ctx.cancel_token)
+
+    def _apermit(self, ctx: Optional[CallContext], tokens: int):
+        if self.limiter is None:
+            return nullcontext()
+        ctx = ctx or CallContext()
+        return self.limiter.aacquire(ctx.session_id, tokens, ctx.cancel_token)
+
+    def _check_cancelled(self, ctx: Optional[CallContext]):
+        if ctx is not None and ctx.cancelled:
+            raise CallCancelledError(self.provider)
+
+    def _backoff(self, ctx: Optional[CallContext], attempt: int):
+        delay = self.retry.delay(attempt)
+        if ctx is not None and ctx.cancel_token is not None:
+            ctx.cancel_token.wait(delay)
+        else:
+            time.sleep(delay)
+
+    def _run_cancellable(self, fn: Callable[[], Any], ctx: Optional[CallContext], permit: ContextManager) -> Any:
+        if ctx is None or ctx.cancel_token is None:
+            with permit:
+                return fn()
+
+        done = threading.Event()
+        outcome = {}
+
+        def run():
+            try:
+                outcome["result"] = fn()
+            except BaseException as exc:
+                outcome["error"] = exc
+            finally:
+                permit.__exit__(None, None, None)
+                done.set()
+
+        permit.__enter__()
+        try:
+            self._check_cancelled(ctx)
+            threading.Thread(target=run, name=f"{self.provider}-call", daemon=True).start()
+        except BaseException:
+            permit.__exit__(None, None, None)
+            raise
+        unregister = ctx.cancel_token.on_cancel(done.set)
+        try:
+            done.wait()
+        finally:
+            unregister()
+        if "error" in outcome:
+            raise outcome["error"]
+        if "result" not in outcome:
+            raise CallCancelledError(self.provider)
+        return outcome["result"]
+
+    async def _await_cancellable(self, awaitable: Awaitable[Any], ctx: Optional[CallContext]) -> Any:
+        if ctx is None or ctx.cancel_token is None:
+            return await awaitable
+
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(awaitable)
+        unregister = ctx.cancel_token.on_cancel(lambda: loop.call_soon_threadsafe(task.cancel))
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if ctx.cancelled:
+                raise CallCancelledError(self.provider)
+            raise
+        finally:
+            unregister()
+
+    def _check_circuit(self):
+        retry_after = self.breaker.before_call()
+        if retry_after is not None:
+            PROVIDER_ERRORS.inc(provider=self.provider, kind="circuit_open")
+            raise CircuitOpenError(self.provider, retry_after)
+        PROVIDER_ATTEMPTS.inc(provider=self.provider)
+
+    def _failure(self, exc: Exception) -> ProviderError:
+        error = classify_error(self.provider, exc)
+        PROVIDER_ERRORS.inc(provider=self.provider, kind=error.kind)
+        if error.retryable:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return error
+
+    @contextmanager
+    def _timed(self, mode: str, started: float):
+        outcome = "error"
+        try:
+            yield
+            outcome = "success"
+        except (GeneratorExit, asyncio.CancelledError, CallCancelledError):
+            outcome = "cancelled"
+            raise
+        finally:
+            PROVIDER_CALL_SECONDS.observe(time.perf_counter() - started, provider=self.provider, mode=mode, outcome=outcome)
+
+    def call(self, fn: Callable[[], Any], ctx: Optional[CallContext] = None, tokens: int = 0) -> Any:
+        with self._timed("call", time.perf_counter()):
+            return self._call(fn, ctx, tokens)
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], ctx: Optional[CallContext] = None, tokens: int = 0) -> Any:
+        with self._timed("async", time.perf_counter()):
+            return await self._acall(fn, ctx, tokens)
+
+    def stream(self, open_stream: Callable[[], Iterator[str]], ctx: Optional[CallContext] = None,
+               tokens: int = 0) -> Iterator[str]:
+        started = time.perf_counter()
+        first_token = True
+        chunks = self._stream(open_stream, ctx, tokens)
+        with self._timed("stream", started):
+            try:
+                for chunk in chunks:
+                    if first_token:
+                        PROVIDER_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started, provider=self.provider)
+                        first_token = False
+                    yield chunk
+            finally:
+                chunks.close()
+
+    def _call(self, fn: Callable[[], Any], ctx: Optional[CallContext], tokens: int) -> Any:
+        attempt = 0
+        while True:
+            self._check_cancelled(ctx)
+            self._check_circuit()
+            try:
+                result = self._run_cancellable(fn, ctx, self._permit(ctx, tokens))
+                self.breaker.record_success()
+                return result
+            except CallCancelledError:
+                self.breaker.cancel_probe()
+                raise
+            except Exception as exc:
+                error = self._failure(exc)
+                if not self.retry.should_retry(error, attempt):
+                    raise error from exc
+            self._backoff(ctx, attempt)
+            attempt += 1
+
+    async def _acall(self, fn: Callable[[], Awaitable[Any]], ctx: Optional[CallContext], tokens: int) -> Any:
+        attempt = 0
+        while True:
+            self._check_cancelled(ctx)
+            self._check_circuit()
+            try:
+                async with self._apermit(ctx, tokens):
+                    self._check_cancelled(ctx)
+                    result = await self._await_cancellable(asyncio.wait_for(fn(), self.timeout), ctx)
+                self.breaker.record_success()
+                return result
+            except (asyncio.CancelledError, CallCancelledError):
+                self.breaker.cancel_probe()
+                raise
+            except Exception as exc:
+                error = self._failure(exc)
+                if not self.retry.should_retry(error, attempt):
+                    raise error from exc
+            await self._await_cancellable(asyncio.sleep(self.retry.delay(attempt)), ctx)
+            attempt += 1
+
+    def _stream(self, open_stream: Callable[[], Iterator[str]], ctx: Optional[CallContext], tokens: int) -> Iterator[str]:
+        attempt = 0
+        while True:
+            self._check_cancelled(ctx)
+            self._check_circuit()
+            started = False
+            try:
+                with self._permit(ctx, tokens):
+                    self._check_cancelled(ctx)
+                    chunks = open_stream()
+                    try:
+                        for chunk in chunks:
+                            self._check_cancelled(ctx)
+                            started = True
+                            yield chunk
+                    finally:
+                        chunks.close()
+                self.breaker.record_success()
+                return
+            except (GeneratorExit, CallCancelledError):
+                self.breaker.cancel_probe()
+                raise
+            except Exception as exc:
+                if ctx is not None and ctx.cancelled:
+                    self.breaker.cancel_probe()
+                    raise CallCancelledError(self.provider) from exc
+                error = self._failure(exc)
+                if started or not self.retry.should_retry(error, attempt):
+                    raise error from exc
+            self._backoff(ctx, attempt)
+            attempt += 1
+
+
+def create_guard(config, prefix: str, provider: str, limiter: Optional["ProviderLimiter"] = None) -> ProviderGuard:
+    return ProviderGuard(
+        provider,
+        timeout=config.get_float(f'{prefix}_TIMEOUT_SECONDS', config.get_float('PROVIDER_TIMEOUT_SECONDS', 60.0)),
+        retry=RetryPolicy(
+            max_attempts=config.get_int(f'{prefix}_MAX_ATTEMPTS', config.get_int('PROVIDER_MAX_ATTEMPTS', 3)),
+            base_delay=config.get_float('PROVIDER_RETRY_BASE_SECONDS', 0.5),
+            max_delay=config.get_float('PROVIDER_RETRY_MAX_SECONDS', 8.0)
+        ),
+        breaker=CircuitBreaker(
+            failure_threshold=config.get_int('CIRCUIT_FAILURE_THRESHOLD', 5),
+            reset_timeout=config.get_float('CIRCUIT_RESET_SECONDS', 30.0)
+        ),
+        limiter=limiter
+    )
@@ -0,0 +1,139 @@
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Optional
+from backend.orchestrator import Orchestrator
+from backend.state import StateBackend
+
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+class SessionLock:
+    def __init__(self, key: str, state: StateBackend, lease_seconds: float = 900, poll_interval: float = 0.05):
+        self.key = key
+        self.state = state
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.owner = None
+        self._local = threading.Lock()
+        self._heartbeat = None
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        deadline = None if timeout < 0 else time.monotonic() + timeout
+        if not self._local.acquire(blocking, timeout):
+            return False
+
+        owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        while not self.state.acquire_lease(self.key, owner, self.lease_seconds):
+            if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                self._local.release()
+                return False
+            time.sleep(self.poll_interval)
+        self.owner = owner
+        self._heartbeat = threading.Event()
+        threading.Thread(target=self._renew, args=(owner, self._heartbeat), daemon=True).start()
+        return True
+
+    def _renew(self, owner: str, stopped: threading.Event):
+        while not stopped.wait(self.lease_seconds / 3):
+            try:
+                if not self.state.acquire_lease(self.key, owner, self.lease_seconds):
+                    return
+            except Exception:
+                continue
+
+    def release(self):
+        owner, self.owner = self.owner, None
+        heartbeat, self._heartbeat = self._heartbeat, None
+        if heartbeat is not None:
+            heartbeat.set()
+        try:
+            self.state.release_lease(self.key, owner)
+        finally:
+            self._local.release()
+
+    def locked(self) -> bool:
+        return self._local.locked()
+
+
+class Session:
+    def __init__(self, session_id: str, orchestrator: Orchestrator, lock=None):
+        self.id = session_id
+        self.orchestrator = orchestrator
+        self.lock = lock or threading.Lock()
+        self.created_at = time.time()
+        self.last_access = self.created_at
+
+    def touch(self):
+        self.last_access = time.time()
+
+    @property
+    def busy(self) -> bool:
+        return self.lock.locked()
+
+
+class SessionStore:
+    def __init__(self, factory: Callable[[str], Orchestrator], max_sessions: int = 500, ttl_seconds: float = 3600,
+                 state: Optional[StateBackend] = None, lease_seconds: float = 900):
+        self.factory = factory
+        self.state = state
+        self.lease_seconds = lease_seconds
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_valid_id(session_id: str) -> bool:
+        return bool(SESSION_ID_PATTERN.match(session_id))
+
+    def get(self, session_id: Optional[str] = None) -> Session:
+        with self._lock:
+            self._evict_expired()
+
+            if session_id and session_id in self._sessions:
+                session = self._sessions[session_id]
+                self._sessions.move_to_end(session_id)
+                session.touch()
+                return session
+
+            session_id = session_id or uuid.uuid4().hex
+            session = Session(session_id, self.factory(session_id), self._lock_for(session_id))
+            self._sessions[session.id] = session
+            self._evict_overflow()
+            return session
+
+    def _lock_for(self, session_id: str):
+        if self.state is None or not self.state.shared:
+            return None
+        return SessionLock(f"session:{session_id}", self.state, self.lease_seconds)
+
+    def remove(self, session_id: str):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.orchestrator.release()
+
+    def _evict_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        for session_id, session in list(self._sessions.items()):
+            if session.last_access >= cutoff:
+                break
+            if not session.busy:
+                del self._sessions[session_id]
+                session.orchestrator.release()
+
+    def _evict_overflow(self):
+        for session_id, session in list(self._sessions.items()):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if not session.busy:
+                del self._sessions[session_id]
+                session.orchestrator.release()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
@@ -0,0 +1,35 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+class StartupReport:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.ready_ms = None
+        self.phases = {}
+        self.lazy = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def record_lazy(self, name: str, seconds: float):
+        with self._lock:
+            self.lazy[name] = round(seconds * 1000, 1)
+
+    def ready(self):
+        self.ready_ms = round((time.perf_counter() - self.started) * 1000, 1)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            lazy = dict(self.lazy)
+        return {"ready_ms": self.ready_ms, "phases": dict(self.phases), "lazy_init_ms": lazy}
+
+
+startup = StartupReport()
@@ -0,0 +1,174 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+Bucket = Tuple[str, float, float]
+
+class TokenBucket:
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.available = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+    def take(self, amount: float):
+        self.available -= min(amount, self.capacity)
+
+
+class StateBackend:
+    shared = False
+
+    def reserve(self, buckets: List[Bucket]) -> float:
+        raise NotImplementedError
+
+    def acquire_lease(self, key: str, owner: str, ttl_seconds: float) -> bool:
+        raise NotImplementedError
+
+    def release_lease(self, key: str, owner: str):
+        raise NotImplementedError
+
+    def lease_owner(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+
+class MemoryStateBackend(StateBackend):
+    def __init__(self):
+        self._buckets = {}
+        self._leases = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, buckets: List[Bucket]) -> float:
+        with self._lock:
+            resolved = []
+            for key, amount, per_minute in buckets:
+                bucket = self._buckets.get(key)
+                if bucket is None or bucket.capacity != per_minute:
+                    bucket = self._buckets[key] = TokenBucket(per_minute)
+                resolved.append((bucket, amount))
+
+            now = time.monotonic()
+            wait = max((bucket.wait_time(amount, now) for bucket, amount in resolved), default=0.0)
+            if wait == 0:
+                for bucket, amount in resolved:
+                    bucket.take(amount)
+            return wait
+
+    def acquire_lease(self, key: str, owner: str, ttl_seconds: float) -> bool:
+        now = time.time()
+        with self._lock:
+            holder = self._leases.get(key)
+            if holder is not None and holder[0] != owner and holder[1] > now:
+                return False
+            self._leases[key] = (owner, now + ttl_seconds)
+            return True
+
+    def release_lease(self, key: str, owner: str):
+        with self._lock:
+            if self._leases.get(key, (None,))[0] == owner:
+                del self._leases[key]
+
+    def lease_owner(self, key: str) -> Optional[str]:
+        with self._lock:
+            holder = self._leases.get(key)
+            return holder[0] if holder is not None and holder[1] > time.time() else None
+
+
+class SQLiteStateBackend(StateBackend):
+    shared = True
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, available REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _write(self, statements):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = statements()
+            self._conn.commit()
+            return result
+        except BaseException:
+            self._conn.rollback()
+            raise
+
+    def reserve(self, buckets: List[Bucket]) -> float:
+        def take() -> float:
+            now = time.time()
+            resolved = []
+            wait = 0.0
+            for key, amount, per_minute in buckets:
+                rate = per_minute / 60.0
+                amount = min(amount, per_minute)
+                row = self._conn.execute("SELECT available, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+                available = per_minute if row is None else min(per_minute, row[0] + (now - row[1]) * rate)
+                if available < amount:
+                    wait = max(wait, (amount - available) / rate)
+                resolved.append((key, available - amount, now))
+            if wait == 0:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO buckets (key, available, updated_at) VALUES (?, ?, ?)", resolved
+                )
+            return wait
+
+        with self._lock:
+            return self._write(take)
+
+    def acquire_lease(self, key: str, owner: str, ttl_seconds: float) -> bool:
+        def claim() -> bool:
+            now = time.time()
+            row = self._conn.execute("SELECT owner, expires_at FROM leases WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] != owner and row[1] > now:
+                return False
+            self._conn.execute(
+                "INSERT OR REPLACE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)", (key, owner, now + ttl_seconds)
+            )
+            return True
+
+        with self._lock:
+            return self._write(claim)
+
+    def release_lease(self, key: str, owner: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+            self._conn.commit()
+
+    def lease_owner(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT owner FROM leases WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+            return row[0] if row else None
+
+
+def create_state_backend(config) -> StateBackend:
+    if config.get('STATE_BACKEND', 'memory') != 'sqlite':
+        return MemoryStateBackend()
+
+    path = Path(config.get('STATE_PATH', 'data/state.sqlite3'))
+    if not path.is_absolute():
+        path = Path(__file__).parent.parent / path
+    return SQLiteStateBackend(str(path))
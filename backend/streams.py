@@ -0,0 +1,158 @@
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from backend.call_context import CancelToken
+
+class EventStream:
+    def __init__(self, session_id: str, name: str, capacity: int = 5000, cancel_token: Optional[CancelToken] = None,
+                 abandon_after: Optional[float] = None):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.name = name
+        self.cancel_token = cancel_token
+        self.abandon_after = abandon_after
+        self.viewers = 0
+        self._detached = 0
+        self.created_at = time.time()
+        self.finished_at = None
+        self.last_id = 0
+        self._buffer = deque(maxlen=capacity)
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def publish(self, event: Dict) -> int:
+        with self._cond:
+            self.last_id += 1
+            self._buffer.append((self.last_id, event))
+            self._cond.notify_all()
+            return self.last_id
+
+    def finish(self):
+        with self._cond:
+            if self.finished_at is None:
+                self.finished_at = time.time()
+            self._cond.notify_all()
+
+    def cancel(self):
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
+
+    def _attach(self):
+        with self._cond:
+            self.viewers += 1
+
+    def _detach(self):
+        with self._cond:
+            self.viewers -= 1
+            if self.viewers or self.finished or self.abandon_after is None:
+                return
+            self._detached += 1
+            detached = self._detached
+        timer = threading.Timer(self.abandon_after, self._cancel_if_abandoned, args=(detached,))
+        timer.daemon = True
+        timer.start()
+
+    def _cancel_if_abandoned(self, detached: int):
+        with self._cond:
+            abandoned = self.viewers == 0 and not self.finished and self._detached == detached
+        if abandoned:
+            self.cancel()
+
+    def _pending(self, cursor: int):
+        first = self._buffer[0][0] if self._buffer else self.last_id + 1
+        return first, list(itertools.islice(self._buffer, max(0, cursor + 1 - first), None))
+
+    def follow(self, last_event_id: int = 0, timeout: float = 15.0) -> Iterator[Optional[Tuple[Optional[int], Dict]]]:
+        cursor = max(0, min(last_event_id, self.last_id))
+        self._attach()
+        try:
+            yield from self._follow(cursor, timeout)
+        finally:
+            self._detach()
+
+    def _follow(self, cursor: int, timeout: float) -> Iterator[Optional[Tuple[Optional[int], Dict]]]:
+        while True:
+            with self._cond:
+                if cursor >= self.last_id and not self.finished:
+                    self._cond.wait(timeout)
+                first, pending = self._pending(cursor)
+                finished = self.finished
+            if pending and pending[0][0] > cursor + 1:
+                yield None, {"type": "gap", "missed": pending[0][0] - cursor - 1}
+            if not pending and not finished:
+                yield None
+            for item in pending:
+                cursor = item[0]
+                yield item
+            if finished and cursor >= self.last_id:
+                return
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "last_event_id": self.last_id,
+            "viewers": self.viewers,
+            "cancelled": self.cancel_token is not None and self.cancel_token.cancelled
+        }
+
+
+class StreamRegistry:
+    def __init__(self, capacity: int = 5000, retention_seconds: float = 300, abandon_seconds: Optional[float] = 30):
+        self.capacity = capacity
+        self.retention_seconds = retention_seconds
+        self.abandon_seconds = abandon_seconds
+        self.streams = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, session_id: str, name: str, events: Callable[[EventStream], Iterator[Dict]],
+              cancel_token: Optional[CancelToken] = None) -> EventStream:
+        stream = EventStream(session_id, name, self.capacity, cancel_token, self.abandon_seconds)
+        with self._lock:
+            self._evict_expired()
+            self.streams[stream.id] = stream
+        threading.Thread(target=self._drive, args=(stream, events(stream)), name=f"stream-{stream.id[:8]}",
+                         daemon=True).start()
+        return stream
+
+    def _drive(self, stream: EventStream, events: Iterator[Dict]):
+        try:
+            for event in events:
+                stream.publish(event)
+        except Exception as e:
+            stream.publish({"type": "error", "agent": "System", "error": str(e)})
+            stream.publish({"type": "complete"})
+        finally:
+            stream.finish()
+
+    def get(self, stream_id: str, session_id: Optional[str] = None) -> Optional[EventStream]:
+        stream = self.streams.get(stream_id)
+        return stream if stream is not None and (session_id is None or stream.session_id == session_id) else None
+
+    def active(self, session_id: str) -> Optional[EventStream]:
+        for stream in list(self.streams.values()):
+            if stream.session_id == session_id and not stream.finished:
+                return stream
+        return None
+
+    def _evict_expired(self):
+        cutoff = time.time() - self.retention_seconds
+        for stream_id, stream in list(self.streams.items()):
+            if stream.finished and stream.finished_at < cutoff:
+                del self.streams[stream_id]
+
+
+def create_stream_registry(config) -> StreamRegistry:
+    return StreamRegistry(
+        capacity=config.get_int('STREAM_BUFFER_EVENTS', 5000),
+        retention_seconds=config.get_float('STREAM_RETENTION_SECONDS', 300),
+        abandon_seconds=config.get_float('STREAM_ABANDON_SECONDS', 30)
+    )
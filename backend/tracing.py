@@ -0,0 +1,75 @@
+import time
+from typing import Dict, Iterator, List
+
+class Span:
+    def __init__(self, name: str, trace_start: float, **attributes):
+        self.name = name
+        self.trace_start = trace_start
+        self.started = time.perf_counter()
+        self.first_token = None
+        self.ended = None
+        self.attributes = attributes
+
+    def mark_first_token(self):
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+
+    def finish(self, **attributes):
+        self.attributes.update(attributes)
+        if self.ended is None:
+            self.ended = time.perf_counter()
+
+    def to_dict(self) -> Dict:
+        ended = self.ended or time.perf_counter()
+        span = {
+            "name": self.name,
+            "start_ms": round((self.started - self.trace_start) * 1000, 1),
+            "duration_ms": round((ended - self.started) * 1000, 1)
+        }
+        if self.first_token is not None:
+            span["first_token_ms"] = round((self.first_token - self.started) * 1000, 1)
+        span.update(self.attributes)
+        return span
+
+
+class Trace:
+    def __init__(self, workflow: str):
+        self.workflow = workflow
+        self.started = time.perf_counter()
+        self.spans: List[Span] = []
+
+    def span(self, name: str, **attributes) -> Span:
+        span = Span(name, self.started, **attributes)
+        self.spans.append(span)
+        return span
+
+    def follow(self, name: str, events: Iterator[Dict]) -> Iterator[Dict]:
+        span = self.span(name)
+        try:
+            for event in events:
+                if event["type"] == "delta":
+                    span.mark_first_token()
+                elif event["type"] == "message":
+                    span.attributes.update({
+                        "cached": event.get("cached", False),
+                        "served_by": event.get("served_by"),
+                        "usage": event.get("usage")
+                    })
+                elif event["type"] == "hedge":
+                    span.attributes["hedged"] = event.get("reason")
+                elif event["type"] == "error":
+                    span.attributes["error"] = (event.get("error_detail") or {}).get("kind", "error")
+                elif event["type"] == "cancelled":
+                    span.attributes["cancelled"] = True
+                elif event["type"] == "compaction":
+                    span.attributes["compacted"] = True
+                yield event
+        finally:
+            span.finish()
+
+    def to_dict(self) -> Dict:
+        return {
+            "workflow": self.workflow,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "spans": [span.to_dict() for span in self.spans]
+        }
@@ -0,0 +1,196 @@
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from backend.artifacts import extract_code_blocks, render_code_blocks
+
+PLACEHOLDER = re.compile(r"\{(\w+(?:\.code)?)\}")
+
+DEFAULT_WORKFLOWS = {
+    "sequential": {
+        "description": "Product Manager writes a spec, the developer codes it, QA reviews it",
+        "nodes": [
+            {
+                "id": "spec",
+                "agent": "chatgpt",
+                "prompt": "As a Product Manager, analyze this request and create a detailed technical specification with key features and tech stack recommendations: {request}"
+            },
+            {
+                "id": "code",
+                "agent": "gemini",
+                "prompt": "As a Full-Stack Developer, based on the specification above, write actual code snippets for the key components. Include both frontend (HTML/JS) and backend (Python/Node.js) code. Keep each code block concise but functional.",
+                "depends_on": ["spec"]
+            },
+            {
+                "id": "qa",
+                "agent": "groq",
+                "prompt": "As a QA Engineer, review the specification and code above. Suggest test cases, potential bugs to watch for, and quality improvements. Provide examples of unit tests if applicable.\n\nCode:\n{code.code}",
+                "depends_on": ["code"]
+            }
+        ]
+    },
+    "parallel_build": {
+        "description": "Frontend and backend are written in parallel from the spec, then QA and security review run in parallel",
+        "nodes": [
+            {
+                "id": "spec",
+                "agent": "chatgpt",
+                "prompt": "As a Product Manager, analyze this request and create a detailed technical specification with key features, API endpoints and tech stack recommendations: {request}"
+            },
+            {
+                "id": "frontend",
+                "agent": "gemini",
+                "prompt": "As a Frontend Developer, based on this specification, write the frontend (HTML/CSS/JS) for the key screens. Keep each code block concise but functional.\n\nSpecification:\n{spec}",
+                "depends_on": ["spec"]
+            },
+            {
+                "id": "backend",
+                "agent": "groq",
+                "prompt": "As a Backend Developer, based on this specification, write the backend (Python or Node.js) for the key API endpoints. Keep each code block concise but functional.\n\nSpecification:\n{spec}",
+                "depends_on": ["spec"]
+            },
+            {
+                "id": "qa",
+                "agent": "groq",
+                "prompt": "As a QA Engineer, review the frontend and backend code below. Suggest test cases, potential bugs to watch for, and quality improvements.\n\nFrontend:\n{frontend.code}\n\nBackend:\n{backend.code}",
+                "depends_on": ["frontend", "backend"]
+            },
+            {
+                "id": "security",
+                "agent": "chatgpt",
+                "prompt": "As a Security Reviewer, review the frontend and backend code below for vulnerabilities such as injection, broken authentication and unsafe data handling. List concrete fixes.\n\nFrontend:\n{frontend.code}\n\nBackend:\n{backend.code}",
+                "depends_on": ["frontend", "backend"]
+            }
+        ]
+    }
+}
+
+class WorkflowError(ValueError):
+    pass
+
+
+class WorkflowNode:
+    def __init__(self, node_id: str, agent: str, prompt: str, depends_on: Optional[Iterable[str]] = None):
+        self.id = node_id
+        self.agent = agent
+        self.prompt = prompt
+        self.depends_on = list(depends_on or [])
+
+    def render_prompt(self, values: Dict[str, str]) -> str:
+        return PLACEHOLDER.sub(lambda match: values.get(match.group(1), match.group(0)), self.prompt)
+
+    def to_dict(self) -> Dict:
+        return {"id": self.id, "agent": self.agent, "prompt": self.prompt, "depends_on": self.depends_on}
+
+
+class Workflow:
+    def __init__(self, name: str, nodes: List[WorkflowNode], description: str = ""):
+        self.name = name
+        self.description = description
+        self.nodes = nodes
+        self.by_id = {node.id: node for node in nodes}
+        self._validate()
+
+    @classmethod
+    def from_dict(cls, name: str, data: Dict) -> "Workflow":
+        try:
+            nodes = [
+                WorkflowNode(node["id"], node["agent"], node["prompt"], node.get("depends_on"))
+                for node in data["nodes"]
+            ]
+        except (KeyError, TypeError) as e:
+            raise WorkflowError(f"Workflow '{name}' is missing field {e}")
+        return cls(name, nodes, data.get("description", ""))
+
+    def _validate(self):
+        if len(self.by_id) != len(self.nodes):
+            raise WorkflowError(f"Workflow '{self.name}' has duplicate node ids")
+        for node in self.nodes:
+            for dependency in node.depends_on:
+                if dependency not in self.by_id:
+                    raise WorkflowError(f"Node '{node.id}' in workflow '{self.name}' depends on unknown node '{dependency}'")
+
+        visiting, visited = set(), set()
+
+        def visit(node_id: str):
+            if node_id in visited:
+                return
+            if node_id in visiting:
+                raise WorkflowError(f"Workflow '{self.name}' has a dependency cycle through '{node_id}'")
+            visiting.add(node_id)
+            for dependency in self.by_id[node_id].depends_on:
+                visit(dependency)
+            visiting.discard(node_id)
+            visited.add(node_id)
+
+        for node in self.nodes:
+            visit(node.id)
+
+    def agents(self) -> List[str]:
+        return list(dict.fromkeys(node.agent for node in self.nodes))
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "nodes": [node.to_dict() for node in self.nodes]
+        }
+
+
+class WorkflowRun:
+    def __init__(self, workflow: Workflow, user_request: str, available_agents: Iterable[str]):
+        self.workflow = workflow
+        self.values = {"request": user_request}
+        self.started = set()
+        self.finished = set()
+        self.skipped = []
+        available = set(available_agents)
+        for node in workflow.nodes:
+            if node.agent not in available:
+                self.skipped.append(node.id)
+
+    def ready(self) -> List[WorkflowNode]:
+        self._finish_skipped()
+        nodes = [
+            node for node in self.workflow.nodes
+            if node.id not in self.started and all(dependency in self.finished for dependency in node.depends_on)
+        ]
+        self.started.update(node.id for node in nodes)
+        return nodes
+
+    def _finish_skipped(self):
+        progressed = True
+        while progressed:
+            progressed = False
+            for node_id in self.skipped:
+                node = self.workflow.by_id[node_id]
+                if node_id not in self.started and all(dependency in self.finished for dependency in node.depends_on):
+                    self.started.add(node_id)
+                    self.finish(node_id, "")
+                    progressed = True
+
+    def prompt(self, node: WorkflowNode) -> str:
+        return node.render_prompt(self.values)
+
+    def finish(self, node_id: str, output: Optional[str]):
+        self.values[node_id] = output or ""
+        self.values[f"{node_id}.code"] = render_code_blocks(extract_code_blocks(output or ""))
+        self.finished.add(node_id)
+
+    @property
+    def done(self) -> bool:
+        return len(self.finished) == len(self.workflow.nodes)
+
+
+def load_workflows(config) -> Dict[str, Workflow]:
+    definitions = dict(DEFAULT_WORKFLOWS)
+
+    path = config.get('WORKFLOWS_FILE')
+    if path:
+        workflow_path = Path(path)
+        if not workflow_path.is_absolute():
+            workflow_path = Path(__file__).parent.parent / workflow_path
+        with open(workflow_path) as f:
+            definitions.update(json.load(f))
+
+    return {name: Workflow.from_dict(name, data) for name, data in definitions.items()}
@@ -0,0 +1,234 @@
+import argparse
+import asyncio
+import json
+import resource
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from backend.async_orchestrator import AsyncOrchestrator
+from backend.config_loader import ConfigLoader
+from backend.history import MemoryConversationStore
+from backend.orchestrator import Orchestrator
+from backend.resilience import RetryPolicy
+from backend.sessions import SessionStore
+from bench.simulated import simulated_agents
+
+SCENARIOS = ["call", "stream", "async-fanout", "sse-sequential", "sse-discussion"]
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = []
+        self.first_tokens = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, first_token: Optional[float] = None, error: bool = False):
+        with self._lock:
+            self.latencies.append(latency)
+            if first_token is not None:
+                self.first_tokens.append(first_token)
+            if error:
+                self.errors += 1
+
+    def summary(self, elapsed: float) -> Dict:
+        return {
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_rps": round(len(self.latencies) / elapsed, 2) if elapsed else None,
+            "latency_ms": {f"p{pct}": _ms(percentile(self.latencies, pct)) for pct in (50, 95, 99)},
+            "first_token_ms": {f"p{pct}": _ms(percentile(self.first_tokens, pct)) for pct in (50, 95, 99)}
+        }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def _root_orchestrator(args, orchestrator_class=Orchestrator) -> Orchestrator:
+    agents = simulated_agents(
+        {
+            "ttft": args.ttft,
+            "ttft_jitter": args.ttft_jitter,
+            "chunks": args.chunks,
+            "chunk_interval": args.chunk_interval,
+            "chunk_size": args.chunk_size,
+            "error_rate": args.error_rate,
+            "seed": args.seed
+        },
+        {"retry": RetryPolicy(max_attempts=args.max_attempts, base_delay=0.05, max_delay=0.5)}
+    )
+    return orchestrator_class(config=ConfigLoader(), agents=agents, history_store=MemoryConversationStore())
+
+
+def run_call(args, recorder: Recorder, worker: int, root: Orchestrator):
+    orchestrator = root.spawn(f"bench-{worker}")
+    for _ in range(args.requests_per_worker):
+        started = time.perf_counter()
+        result = orchestrator.call_agent(args.agent, "Benchmark prompt")
+        recorder.record(time.perf_counter() - started, error=not result["success"])
+
+
+def run_stream(args, recorder: Recorder, worker: int, root: Orchestrator):
+    orchestrator = root.spawn(f"bench-{worker}")
+    for _ in range(args.requests_per_worker):
+        started = time.perf_counter()
+        first_token, error = None, False
+        for event in orchestrator.stream_agent(args.agent, "Benchmark prompt"):
+            if event["type"] == "delta" and first_token is None:
+                first_token = time.perf_counter() - started
+            elif event["type"] == "error":
+                error = True
+        recorder.record(time.perf_counter() - started, first_token, error)
+
+
+def run_async_fanout(args, recorder: Recorder, worker: int, root: Orchestrator):
+    orchestrator = root.spawn(f"bench-{worker}")
+    calls = [(agent_name, "Benchmark prompt") for agent_name in orchestrator.get_available_agents()]
+
+    async def fan_out_all():
+        for _ in range(args.requests_per_worker):
+            started = time.perf_counter()
+            results = await orchestrator.fan_out(calls)
+            recorder.record(time.perf_counter() - started, error=not all(result["success"] for result in results))
+
+    asyncio.run(fan_out_all())
+
+
+def run_sse(args, recorder: Recorder, worker: int, root: Orchestrator):
+    import app as app_module
+
+    client = app_module.app.test_client()
+    if args.scenario == "sse-sequential":
+        path, body = "/api/workflow/sequential-stream", {"request": "Build a benchmark app", "workflow": args.workflow}
+    else:
+        path, body = "/api/workflow/discussion-stream", {"topic": "Benchmarking", "rounds": args.rounds}
+
+    for _ in range(args.requests_per_worker):
+        started = time.perf_counter()
+        first_token, error = None, False
+        response = client.post(path, json=body, headers={"X-Session-Id": f"bench-{worker}"}, buffered=False)
+        for line in response.iter_encoded():
+            for frame in line.decode().split("\n"):
+                if not frame.startswith("data: "):
+                    continue
+                event = json.loads(frame[len("data: "):])
+                if event["type"] == "delta" and first_token is None:
+                    first_token = time.perf_counter() - started
+                elif event["type"] == "error":
+                    error = True
+        response.close()
+        recorder.record(time.perf_counter() - started, first_token, error)
+
+
+RUNNERS = {
+    "call": run_call,
+    "stream": run_stream,
+    "async-fanout": run_async_fanout,
+    "sse-sequential": run_sse,
+    "sse-discussion": run_sse
+}
+
+def install_app_sessions(root: Orchestrator):
+    import app as app_module
+
+    app_module.sessions = SessionStore(root.spawn, max_sessions=100000)
+
+
+def run_benchmark(args) -> Dict:
+    root = _root_orchestrator(args, AsyncOrchestrator if args.scenario == "async-fanout" else Orchestrator)
+    if args.scenario.startswith("sse-"):
+        install_app_sessions(root)
+
+    runner: Callable = RUNNERS[args.scenario]
+    recorder = Recorder()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(runner, args, recorder, worker, root) for worker in range(args.concurrency)]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    report = {
+        "scenario": args.scenario,
+        "concurrency": args.concurrency,
+        "profile": {
+            "ttft_seconds": args.ttft,
+            "ttft_jitter": args.ttft_jitter,
+            "chunks": args.chunks,
+            "chunk_interval_seconds": args.chunk_interval,
+            "error_rate": args.error_rate
+        }
+    }
+    report.update(recorder.summary(elapsed))
+    report["memory_mb"] = {
+        "traced_peak": round(peak / (1024 * 1024), 2),
+        "max_rss": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+    }
+    return report
+
+
+def format_report(report: Dict) -> str:
+    latency, first_token, memory = report["latency_ms"], report["first_token_ms"], report["memory_mb"]
+    lines = [
+        f"scenario={report['scenario']} concurrency={report['concurrency']} "
+        f"requests={report['requests']} errors={report['errors']} elapsed={report['elapsed_seconds']}s",
+        f"  throughput: {report['throughput_rps']} req/s",
+        f"  latency ms: p50={latency['p50']} p95={latency['p95']} p99={latency['p99']}"
+    ]
+    if first_token["p50"] is not None:
+        lines.append(f"  first token ms: p50={first_token['p50']} p95={first_token['p95']} p99={first_token['p99']}")
+    lines.append(f"  memory MB: traced peak={memory['traced_peak']} max rss={memory['max_rss']}")
+    return "\n".join(lines)
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Offline AgentTalk benchmark with simulated providers")
+    parser.add_argument("--scenario", choices=SCENARIOS + ["all"], default="all")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests-per-worker", type=int, default=5)
+    parser.add_argument("--agent", default="chatgpt")
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--workflow", default="sequential", help="workflow run by the sse-sequential scenario")
+    parser.add_argument("--ttft", type=float, default=0.2, help="median time to first token in seconds")
+    parser.add_argument("--ttft-jitter", type=float, default=0.5, help="lognormal sigma applied to the first-token delay")
+    parser.add_argument("--chunks", type=int, default=40)
+    parser.add_argument("--chunk-interval", type=float, default=0.005)
+    parser.add_argument("--chunk-size", type=int, default=24)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="print machine-readable reports")
+    parser.add_argument("--output", help="also append reports to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    scenarios = SCENARIOS if args.scenario == "all" else [args.scenario]
+
+    for scenario in scenarios:
+        args.scenario = scenario
+        report = run_benchmark(args)
+        text = json.dumps(report) if args.json else format_report(report)
+        print(text, flush=True)
+        if args.output:
+            with open(args.output, "a") as f:
+                f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
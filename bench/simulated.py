@@ -0,0 +1,94 @@
+import asyncio
+import random
+import time
+from typing import Dict, Iterator, List, Optional
+from backend.agents import Agent
+from backend.call_context import CallContext
+from backend.context_builder import estimate_tokens
+from backend.resilience import ProviderGuard
+
+class SimulatedProviderError(Exception):
+    def __init__(self, provider: str, status_code: int = 503):
+        super().__init__(f"simulated {status_code} from {provider}")
+        self.status_code = status_code
+
+
+class LatencyProfile:
+    def __init__(self, ttft: float = 0.3, ttft_jitter: float = 0.5, chunks: int = 40,
+                 chunk_interval: float = 0.01, chunk_size: int = 24, error_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.ttft = ttft
+        self.ttft_jitter = ttft_jitter
+        self.chunks = chunks
+        self.chunk_interval = chunk_interval
+        self.chunk_size = chunk_size
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+
+    def sample_ttft(self) -> float:
+        if self.ttft <= 0:
+            return 0.0
+        return self.ttft * self._random.lognormvariate(0, self.ttft_jitter)
+
+    def should_fail(self) -> bool:
+        return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    def chunk_text(self, index: int) -> str:
+        word = f"tok{index} "
+        return (word * (self.chunk_size // len(word) + 1))[:self.chunk_size]
+
+
+class SimulatedAgent(Agent):
+    def __init__(self, name: str, role: str, profile: LatencyProfile, model: str = "simulated",
+                 guard: Optional[ProviderGuard] = None):
+        super().__init__(name, role, model, guard=guard)
+        self.profile = profile
+
+    def _record_simulated_usage(self, messages: List[Dict], ctx: Optional[CallContext], text: str):
+        self.record_usage(ctx, sum(estimate_tokens(msg["content"]) for msg in messages), estimate_tokens(text))
+
+    def _chunks(self, messages: List[Dict], ctx: Optional[CallContext]) -> Iterator[str]:
+        time.sleep(self.profile.sample_ttft())
+        if self.profile.should_fail():
+            raise SimulatedProviderError(self.name)
+        chunks = []
+        for index in range(self.profile.chunks):
+            if index:
+                time.sleep(self.profile.chunk_interval)
+            chunks.append(self.profile.chunk_text(index))
+            yield chunks[-1]
+        self._record_simulated_usage(messages, ctx, "".join(chunks))
+
+    async def _achunks(self, messages: List[Dict], ctx: Optional[CallContext]) -> str:
+        await asyncio.sleep(self.profile.sample_ttft())
+        if self.profile.should_fail():
+            raise SimulatedProviderError(self.name)
+        await asyncio.sleep(self.profile.chunk_interval * max(0, self.profile.chunks - 1))
+        text = "".join(self.profile.chunk_text(index) for index in range(self.profile.chunks))
+        self._record_simulated_usage(messages, ctx, text)
+        return text
+
+    def complete(self, messages: List[Dict], ctx: Optional[CallContext] = None) -> str:
+        return self.guard.call(lambda: "".join(self._chunks(messages, ctx)), ctx, self.estimate_request_tokens(messages))
+
+    def complete_stream(self, messages: List[Dict], ctx: Optional[CallContext] = None) -> Iterator[str]:
+        return self.guard.stream(lambda: self._chunks(messages, ctx), ctx, self.estimate_request_tokens(messages))
+
+    async def acomplete(self, messages: List[Dict], ctx: Optional[CallContext] = None) -> str:
+        return await self.guard.acall(lambda: self._achunks(messages, ctx), ctx, self.estimate_request_tokens(messages))
+
+
+SIMULATED_ROLES = {
+    "chatgpt": ("ChatGPT", "Product Manager"),
+    "gemini": ("Gemini", "Full-Stack Developer"),
+    "groq": ("Groq", "QA Engineer")
+}
+
+def simulated_agents(profile_options: Dict, guard_options: Optional[Dict] = None) -> Dict[str, Agent]:
+    agents = {}
+    for index, (key, (name, role)) in enumerate(SIMULATED_ROLES.items()):
+        options = dict(profile_options)
+        if options.get("seed") is not None:
+            options["seed"] += index
+        agents[key] = SimulatedAgent(name, role, LatencyProfile(**options), guard=ProviderGuard(name, **(guard_options or {})))
+    return agents
@@ -8,12 +8,339 @@ const agentColors = {
     'System': { emoji: '✅', class: 'agent-system' }
 };
 
+let sessionId = sessionStorage.getItem('agentTalkSessionId');
+
+function sessionHeaders(headers = {}) {
+    return sessionId ? { ...headers, 'X-Session-Id': sessionId } : headers;
+}
+
+function rememberSession(response) {
+    const id = response.headers.get('X-Session-Id');
+    if (id && id !== sessionId) {
+        sessionId = id;
+        sessionStorage.setItem('agentTalkSessionId', id);
+    }
+}
+
+const MAX_RECONNECT_ATTEMPTS = 6;
+const ESTIMATED_MESSAGE_HEIGHT = 120;
+const MESSAGE_GAP = 15;
+const OVERSCAN_PX = 600;
+const STICKY_BOTTOM_PX = 40;
+const RENDER_WORKER_URL = new URL('render-worker.js', document.currentScript.src).href;
+
+class MessageFormatter {
+    constructor(url) {
+        this.jobs = new Map();
+        this.nextId = 0;
+        this.worker = null;
+        try {
+            this.worker = new Worker(url);
+            this.worker.onmessage = (event) => this.finish(event.data.id, event.data.html);
+            this.worker.onerror = (error) => {
+                console.warn('Render worker failed, formatting on the main thread:', error);
+                this.fallback();
+            };
+        } catch (error) {
+            console.warn('Render worker unavailable, formatting on the main thread:', error);
+        }
+    }
+
+    format(text) {
+        if (!this.worker) {
+            return Promise.resolve(formatMessage(text));
+        }
+        const id = ++this.nextId;
+        return new Promise(resolve => {
+            this.jobs.set(id, { text, resolve });
+            this.worker.postMessage({ id, text });
+        });
+    }
+
+    finish(id, html) {
+        const job = this.jobs.get(id);
+        if (job) {
+            this.jobs.delete(id);
+            job.resolve(html);
+        }
+    }
+
+    fallback() {
+        this.worker.terminate();
+        this.worker = null;
+        for (const job of this.jobs.values()) {
+            job.resolve(formatMessage(job.text));
+        }
+        this.jobs.clear();
+    }
+}
+
+class ConversationView {
+    constructor(container) {
+        this.container = container;
+        this.entries = [];
+        this.byId = new Map();
+        this.nodes = new Map();
+        this.nextId = 0;
+        this.frame = null;
+        this.stick = true;
+        this.topSpacer = document.createElement('div');
+        this.bottomSpacer = document.createElement('div');
+        this.topSpacer.className = 'conversation-spacer';
+        this.bottomSpacer.className = 'conversation-spacer';
+
+        container.addEventListener('scroll', () => {
+            this.stick = container.scrollHeight - container.scrollTop - container.clientHeight < STICKY_BOTTOM_PX;
+            this.schedule();
+        }, { passive: true });
+        window.addEventListener('resize', () => this.schedule());
+    }
+
+    clear(placeholder = '') {
+        this.entries = [];
+        this.byId.clear();
+        this.nodes.clear();
+        this.stick = true;
+        this.container.innerHTML = placeholder;
+    }
+
+    add(entry) {
+        if (!this.entries.length) {
+            this.container.replaceChildren(this.topSpacer, this.bottomSpacer);
+        }
+        entry.id = ++this.nextId;
+        entry.version = 0;
+        entry.height = ESTIMATED_MESSAGE_HEIGHT;
+        this.entries.push(entry);
+        this.byId.set(entry.id, entry);
+        this.schedule();
+        return entry;
+    }
+
+    remove(entry) {
+        const index = this.entries.indexOf(entry);
+        if (index === -1) {
+            return;
+        }
+        this.entries.splice(index, 1);
+        this.byId.delete(entry.id);
+        this.nodes.get(entry.id)?.remove();
+        this.nodes.delete(entry.id);
+        this.schedule();
+    }
+
+    get(id) {
+        return this.byId.get(id);
+    }
+
+    changed(entry) {
+        entry.version++;
+        this.schedule();
+    }
+
+    schedule() {
+        if (this.frame === null) {
+            this.frame = requestAnimationFrame(() => {
+                this.frame = null;
+                this.render();
+            });
+        }
+    }
+
+    render() {
+        if (!this.entries.length) {
+            this.topSpacer.style.height = '0px';
+            this.bottomSpacer.style.height = '0px';
+            return;
+        }
+
+        const { visible, before, after } = this.visibleRange();
+
+        const keep = new Set(visible.map(entry => entry.id));
+        for (const [id, node] of this.nodes) {
+            if (!keep.has(id)) {
+                node.remove();
+                this.nodes.delete(id);
+            }
+        }
+
+        let previous = this.topSpacer;
+        for (const entry of visible) {
+            let node = this.nodes.get(entry.id);
+            if (!node || node.version !== entry.version) {
+                const fresh = buildEntryNode(entry);
+                node?.replaceWith(fresh);
+                node = fresh;
+                this.nodes.set(entry.id, node);
+            } else if (node.flushed < entry.text.length) {
+                node.querySelector('.message-text').append(entry.text.slice(node.flushed));
+                node.flushed = entry.text.length;
+            }
+            if (previous.nextSibling !== node) {
+                previous.after(node);
+            }
+            previous = node;
+        }
+        this.topSpacer.style.height = `${before}px`;
+        this.bottomSpacer.style.height = `${after}px`;
+
+        let resized = false;
+        for (const entry of visible) {
+            const height = this.nodes.get(entry.id).offsetHeight + MESSAGE_GAP;
+            if (height !== entry.height) {
+                entry.height = height;
+                resized = true;
+            }
+        }
+        if (this.stick) {
+            this.container.scrollTop = this.container.scrollHeight;
+        }
+        if (resized) {
+            this.schedule();
+        }
+    }
+
+    visibleRange() {
+        const visible = [];
+        let before = 0;
+        let after = 0;
+
+        if (this.stick) {
+            let height = 0;
+            let index = this.entries.length;
+            while (index > 0 && height < this.container.clientHeight + OVERSCAN_PX) {
+                index--;
+                height += this.entries[index].height;
+                visible.unshift(this.entries[index]);
+            }
+            for (let i = 0; i < index; i++) {
+                before += this.entries[i].height;
+            }
+            return { visible, before, after };
+        }
+
+        const top = this.container.scrollTop - OVERSCAN_PX;
+        const bottom = this.container.scrollTop + this.container.clientHeight + OVERSCAN_PX;
+        let offset = 0;
+        for (const entry of this.entries) {
+            if (offset + entry.height < top) {
+                before += entry.height;
+            } else if (offset > bottom) {
+                after += entry.height;
+            } else {
+                visible.push(entry);
+            }
+            offset += entry.height;
+        }
+        return { visible, before, after };
+    }
+}
+
+const formatter = new MessageFormatter(RENDER_WORKER_URL);
+let conversation = null;
+const pendingEntries = new Map();
+
+function conversationView() {
+    if (!conversation) {
+        conversation = new ConversationView(document.getElementById('conversationFlow'));
+    }
+    return conversation;
+}
+
 document.addEventListener('DOMContentLoaded', () => {
     loadAgentStatus();
+    loadWorkflows();
     setupTabs();
     setupDarkMode();
+    resumeRun();
 });
 
+async function readEventStream(response, run) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let eventId = null;
+    let received = false;
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+
+        for (const line of lines) {
+            if (line.startsWith('id: ')) {
+                eventId = parseInt(line.slice(4));
+            } else if (line.startsWith('data: ')) {
+                const data = JSON.parse(line.slice(6));
+                handleStreamEvent(data);
+                received = true;
+                if (eventId !== null) {
+                    run.lastEventId = eventId;
+                    sessionStorage.setItem('agentTalkRun', run.id);
+                }
+                if (data.type === 'complete') {
+                    run.complete = true;
+                }
+            } else if (line === '') {
+                eventId = null;
+            }
+        }
+    }
+    return received;
+}
+
+async function followRun(response, run = { id: response.headers.get('X-Run-Id'), lastEventId: 0, complete: false }) {
+    rememberSession(response);
+    let attempt = 0;
+
+    while (true) {
+        try {
+            if (response.ok && await readEventStream(response, run)) {
+                attempt = 0;
+            }
+        } catch (error) {
+            console.warn('Stream interrupted:', error);
+        }
+
+        if (run.complete || !run.id || response.status === 404) {
+            sessionStorage.removeItem('agentTalkRun');
+            return;
+        }
+        if (attempt >= MAX_RECONNECT_ATTEMPTS) {
+            throw new Error(`Lost connection to run ${run.id}`);
+        }
+
+        attempt++;
+        updateAnimationStatus(`Connection lost - reconnecting (attempt ${attempt})...`);
+        await new Promise(resolve => setTimeout(resolve, Math.min(500 * 2 ** (attempt - 1), 8000)));
+
+        try {
+            response = await fetch(`${API_BASE}/api/runs/${run.id}/events`, {
+                headers: sessionHeaders({ 'Last-Event-ID': String(run.lastEventId) })
+            });
+        } catch (error) {
+            response = { ok: false, status: 0, headers: new Headers() };
+        }
+    }
+}
+
+async function resumeRun() {
+    const runId = sessionStorage.getItem('agentTalkRun');
+    if (!runId) {
+        return;
+    }
+
+    try {
+        const response = await fetch(`${API_BASE}/api/runs/${runId}/events`, { headers: sessionHeaders() });
+        await followRun(response, { id: runId, lastEventId: 0, complete: false });
+    } catch (error) {
+        console.error('Error resuming run:', error);
+    }
+}
+
 function setupDarkMode() {
     const darkModeToggle = document.getElementById('darkModeToggle');
     const body = document.body;
@@ -58,7 +385,8 @@ function setupTabs() {
 
 async function loadAgentStatus() {
     try {
-        const response = await fetch(`${API_BASE}/api/status`);
+        const response = await fetch(`${API_BASE}/api/status`, { headers: sessionHeaders() });
+        rememberSession(response);
         const data = await response.json();
 
         if (data.success) {
@@ -70,6 +398,23 @@ async function loadAgentStatus() {
     }
 }
 
+async function loadWorkflows() {
+    try {
+        const response = await fetch(`${API_BASE}/api/workflows`, { headers: sessionHeaders() });
+        rememberSession(response);
+        const data = await response.json();
+
+        if (data.success) {
+            const select = document.getElementById('workflowSelect');
+            select.innerHTML = data.workflows.map(workflow => `
+                <option value="${workflow.name}" title="${workflow.description}" ${workflow.name === 'sequential' ? 'selected' : ''}>${workflow.name}</option>
+            `).join('');
+        }
+    } catch (error) {
+        console.error('Error loading workflows:', error);
+    }
+}
+
 function displayAgentStatus(agents) {
     const statusDiv = document.getElementById('agentStatus');
 
@@ -93,36 +438,16 @@ async function runSequentialWorkflow() {
         return;
     }
 
-    clearConversation();
-    const flowDiv = document.getElementById('conversationFlow');
-    flowDiv.innerHTML = '';
+    conversationView().clear();
+    pendingEntries.clear();
 
     try {
         const response = await fetch(`${API_BASE}/api/workflow/sequential-stream`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ request: input })
+            headers: sessionHeaders({ 'Content-Type': 'application/json' }),
+            body: JSON.stringify({ request: input, workflow: document.getElementById('workflowSelect').value })
         });
-
-        const reader = response.body.getReader();
-        const decoder = new TextDecoder();
-        let buffer = '';
-
-        while (true) {
-            const { done, value } = await reader.read();
-            if (done) break;
-
-            buffer += decoder.decode(value, { stream: true });
-            const lines = buffer.split('\n');
-            buffer = lines.pop();
-
-            for (const line of lines) {
-                if (line.startsWith('data: ')) {
-                    const data = JSON.parse(line.slice(6));
-                    handleStreamEvent(data);
-                }
-            }
-        }
+        await followRun(response);
     } catch (error) {
         console.error('Error running workflow:', error);
         showError('Failed to run workflow. Check console for details.');
@@ -130,61 +455,90 @@ async function runSequentialWorkflow() {
 }
 
 function handleStreamEvent(event) {
-    const flowDiv = document.getElementById('conversationFlow');
+    const view = conversationView();
 
     if (event.type === 'start') {
         console.log(event.message);
         updateAnimationStatus('Workflow starting...');
         document.querySelector('.data-packet').classList.add('moving');
     } else if (event.type === 'thinking') {
-        const thinkingDiv = document.createElement('div');
-        thinkingDiv.id = `thinking-${event.agent}`;
-        thinkingDiv.className = 'agent-message thinking';
-        thinkingDiv.innerHTML = `
-            <div class="agent-avatar ${agentColors[event.agent]?.class || 'agent-user'}">
-                ${agentColors[event.agent]?.emoji || '🤖'}
-            </div>
-            <div class="message-content">
-                <div class="message-header">
-                    <span class="agent-name">${event.agent}</span>
-                    <span class="agent-role">${event.role}</span>
-                </div>
-                <div class="message-text thinking-indicator">
-                    <span class="thinking-dots"></span>
-                    Thinking...
-                </div>
-            </div>
-        `;
-        flowDiv.appendChild(thinkingDiv);
-        flowDiv.scrollTop = flowDiv.scrollHeight;
+        const entry = view.add({ kind: 'pending', agent: event.agent, role: event.role, text: '' });
+        pendingEntries.set(streamKey(event), entry);
 
         activateAgent(event.agent);
         updateAnimationStatus(`${event.agent} is thinking...`);
+    } else if (event.type === 'delta') {
+        appendDelta(streamKey(event), event.agent, event.delta);
+    } else if (event.type === 'gap') {
+        console.warn(`Missed ${event.missed} streamed events while reconnecting`);
+    } else if (event.type === 'hedge') {
+        const reason = event.reason === 'error' ? 'failed' : 'is slow';
+        updateAnimationStatus(`${event.agent} ${reason} - also asking ${event.alternate}...`);
+    } else if (event.type === 'skipped') {
+        updateAnimationStatus(`${event.agent} has nothing new to add - skipping round ${event.round}`);
+    } else if (event.type === 'converged') {
+        updateAnimationStatus(`Discussion converged after round ${event.round}`);
     } else if (event.type === 'message') {
-        const thinkingDiv = document.getElementById(`thinking-${event.agent}`);
-        if (thinkingDiv) {
-            thinkingDiv.remove();
-        }
-
+        removePending(event);
         deactivateAgent(event.agent);
 
-        addMessageToUI(event.agent, event.role, event.message);
+        addMessageToUI(event.agent, event.role, event.message, event.cached, event.served_by);
 
         if (event.agent !== 'System') {
             updateAnimationStatus(`${event.agent} completed their response`);
         }
     } else if (event.type === 'error') {
-        showError(`Error from ${event.agent}: ${event.error}`);
-        deactivateAllAgents();
-        updateAnimationStatus('Error occurred');
+        removePending(event);
+        deactivateAgent(event.agent);
+        addErrorToUI(event.agent, event.role, event.error);
+        updateAnimationStatus(`${event.agent} failed - continuing`);
+    } else if (event.type === 'cancelled') {
+        removePending(event);
+        deactivateAgent(event.agent);
+        if (event.agent === 'System') {
+            addMessageToUI('System', 'Orchestrator', `⏹️ ${event.message}`);
+            updateAnimationStatus('⏹️ Stopped');
+        }
     } else if (event.type === 'complete') {
         console.log('Workflow complete!');
+        if (event.trace) {
+            console.log('Workflow trace', event.trace);
+        }
         deactivateAllAgents();
         document.querySelector('.data-packet').classList.remove('moving');
         updateAnimationStatus('✅ All done! Agents are idle.');
     }
 }
 
+function streamKey(event) {
+    return event.node ? `${event.agent}-${event.node}` : event.agent;
+}
+
+function removePending(event) {
+    const key = streamKey(event);
+    const entry = pendingEntries.get(key);
+    if (entry) {
+        pendingEntries.delete(key);
+        conversationView().remove(entry);
+    }
+}
+
+function appendDelta(key, agent, delta) {
+    const entry = pendingEntries.get(key);
+    if (!entry) {
+        return;
+    }
+
+    if (!entry.text) {
+        entry.text = delta;
+        conversationView().changed(entry);
+        updateAnimationStatus(`${agent} is responding...`);
+    } else {
+        entry.text += delta;
+        conversationView().schedule();
+    }
+}
+
 function activateAgent(agentName) {
     const nodeId = `node-${agentName.toLowerCase()}`;
     const node = document.getElementById(nodeId);
@@ -214,44 +568,129 @@ function updateAnimationStatus(message) {
     }
 }
 
-function addMessageToUI(agent, role, message) {
-    const flowDiv = document.getElementById('conversationFlow');
-    const messageDiv = document.createElement('div');
-    messageDiv.className = 'agent-message';
+function addMessageToUI(agent, role, message, cached = false, servedBy = null) {
+    const view = conversationView();
+    const entry = view.add({
+        kind: 'message',
+        agent,
+        role,
+        text: message,
+        html: null,
+        cached,
+        servedBy,
+        collapsed: message.split('\n').length > 10 || message.length > 800,
+        openCode: new Set()
+    });
+
+    formatter.format(message).then(html => {
+        entry.html = html;
+        view.changed(entry);
+    });
+}
+
+function addErrorToUI(agent, role, error) {
+    conversationView().add({ kind: 'error', agent, role, text: error });
+}
 
-    if (agent === 'User') {
-        messageDiv.classList.add('user-message');
-    } else if (agent === 'System') {
-        messageDiv.classList.add('system-message');
+function buildEntryNode(entry) {
+    const node = document.createElement('div');
+    node.className = 'agent-message';
+    node.dataset.entry = entry.id;
+    node.version = entry.version;
+    node.flushed = entry.text.length;
+    if (entry.rendered) {
+        node.classList.add('settled');
     }
+    entry.rendered = true;
 
-    const agentInfo = agentColors[agent] || agentColors['User'];
-    const messageId = 'msg-' + Math.random().toString(36).substr(2, 9);
+    if (entry.kind === 'pending') {
+        const agentInfo = agentColors[entry.agent];
+        if (!entry.text) {
+            node.classList.add('thinking');
+        }
+        node.innerHTML = `
+            <div class="agent-avatar ${agentInfo?.class || 'agent-user'}">
+                ${agentInfo?.emoji || '🤖'}
+            </div>
+            <div class="message-content">
+                <div class="message-header">
+                    <span class="agent-name">${entry.agent}</span>
+                    <span class="agent-role">${entry.role}</span>
+                </div>
+                ${entry.text ? '<div class="message-text streaming"></div>' : `
+                <div class="message-text thinking-indicator">
+                    <span class="thinking-dots"></span>
+                    Thinking...
+                </div>`}
+            </div>
+        `;
+        if (entry.text) {
+            node.querySelector('.message-text').textContent = entry.text;
+        }
+        return node;
+    }
 
-    const lineCount = message.split('\n').length;
-    const shouldCollapse = lineCount > 10 || message.length > 800;
+    if (entry.kind === 'error') {
+        const agentInfo = agentColors[entry.agent] || agentColors['System'];
+        node.classList.add('error-message');
+        node.innerHTML = `
+            <div class="agent-avatar ${agentInfo.class}">
+                ${agentInfo.emoji}
+            </div>
+            <div class="message-content">
+                <div class="message-header">
+                    <span class="agent-name">${entry.agent}</span>
+                    <span class="agent-role">${entry.role || ''}</span>
+                </div>
+                <div class="message-text">❌ ${escapeHtml(entry.text)}</div>
+            </div>
+        `;
+        return node;
+    }
+
+    if (entry.agent === 'User') {
+        node.classList.add('user-message');
+    } else if (entry.agent === 'System') {
+        node.classList.add('system-message');
+    }
+
+    const agentInfo = agentColors[entry.agent] || agentColors['User'];
+    const messageId = `msg-${entry.id}`;
+    const collapsible = entry.kind === 'message' && (entry.collapsed || entry.expanded);
 
-    messageDiv.innerHTML = `
+    node.innerHTML = `
         <div class="agent-avatar ${agentInfo.class}">
             ${agentInfo.emoji}
         </div>
         <div class="message-content">
             <div class="message-header">
-                <span class="agent-name">${agent}</span>
-                <span class="agent-role">${role || ''}</span>
+                <span class="agent-name">${entry.agent}</span>
+                <span class="agent-role">${entry.role || ''}${entry.cached ? ' <span class="cache-badge" title="Served from the response cache">cached</span>' : ''}${entry.servedBy && entry.servedBy !== entry.agent ? ` <span class="cache-badge" title="Answered by a fallback provider">via ${entry.servedBy}</span>` : ''}</span>
             </div>
-            <div id="${messageId}" class="message-text ${shouldCollapse ? 'collapsed' : ''}">${formatMessage(message)}</div>
-            ${shouldCollapse ? `<button class="message-toggle" onclick="toggleMessage('${messageId}')">Show more...</button>` : ''}
+            <div id="${messageId}" class="message-text ${entry.collapsed ? 'collapsed' : ''} ${entry.html === null ? 'streaming' : ''}">${entry.html ?? escapeHtml(entry.text)}</div>
+            ${collapsible ? `<button class="message-toggle" onclick="toggleMessage('${messageId}')">${entry.collapsed ? 'Show more...' : 'Show less'}</button>` : ''}
         </div>
     `;
 
-    flowDiv.appendChild(messageDiv);
-    flowDiv.scrollTop = flowDiv.scrollHeight;
+    for (const codeId of entry.openCode || []) {
+        const codeBlock = node.querySelector(`#${codeId}`);
+        if (codeBlock) {
+            codeBlock.classList.remove('collapsed');
+            codeBlock.nextElementSibling.textContent = 'Show less';
+        }
+    }
+    return node;
+}
+
+function entryFor(element) {
+    const node = element.closest('[data-entry]');
+    return node ? conversationView().get(Number(node.dataset.entry)) : null;
 }
 
 function toggleMessage(messageId) {
     const messageText = document.getElementById(messageId);
     const button = messageText.nextElementSibling;
+    const entry = entryFor(messageText);
 
     if (messageText.classList.contains('collapsed')) {
         messageText.classList.remove('collapsed');
@@ -260,63 +699,29 @@ function toggleMessage(messageId) {
         messageText.classList.add('collapsed');
         button.textContent = 'Show more...';
     }
-}
-
-function formatMessage(text) {
-    const escaped = escapeHtml(text);
-
-    // First, handle properly formatted code blocks with triple backticks
-    let formatted = escaped.replace(/```(\w+)?\n([\s\S]*?)```/g, (match, lang, code) => {
-        const codeId = 'code-' + Math.random().toString(36).substr(2, 9);
-        const lines = code.trim().split('\n').length;
-
-        if (lines > 10 || code.length > 500) {
-            return `<pre id="${codeId}" class="collapsed"><code class="language-${lang || ''}">${code}</code></pre>
-                    <button class="code-toggle" onclick="toggleCode('${codeId}')">Show more...</button>`;
-        }
-        return `<pre><code class="language-${lang || ''}">${code}</code></pre>`;
-    });
 
-    // Auto-detect and format code blocks that aren't wrapped in backticks
-    // Look for patterns like: multiple lines with code-like syntax
-    formatted = formatted.replace(/\n((?:(?:[ \t]*(?:function|class|def|import|const|let|var|if|for|while|return|public|private|protected|async|await|export|interface|type)\b[^\n]*\n)|(?:[ \t]*[{}\[\];()][^\n]*\n)|(?:[ \t]+[^\n]+\n)){3,})/g, (match, code) => {
-        // Check if this is already in a code block
-        if (match.includes('<pre>') || match.includes('</pre>')) {
-            return match;
-        }
-
-        const codeId = 'code-' + Math.random().toString(36).substr(2, 9);
-        const lines = code.trim().split('\n').length;
-        const trimmedCode = code.trim();
-
-        // Detect language based on content
-        let lang = '';
-        if (trimmedCode.match(/\b(function|const|let|var|=>|console\.log)\b/)) lang = 'javascript';
-        else if (trimmedCode.match(/\b(def|import|class|print|if __name__)\b/)) lang = 'python';
-        else if (trimmedCode.match(/\b(<html|<div|<body|<script|<style)\b/)) lang = 'html';
-        else if (trimmedCode.match(/\b(public|private|protected|class|interface)\b/)) lang = 'java';
-
-        if (lines > 10 || trimmedCode.length > 500) {
-            return `\n<pre id="${codeId}" class="collapsed"><code class="language-${lang}">${trimmedCode}</code></pre>
-                    <button class="code-toggle" onclick="toggleCode('${codeId}')">Show more...</button>`;
-        }
-        return `\n<pre><code class="language-${lang}">${trimmedCode}</code></pre>`;
-    });
-
-    return formatted;
+    if (entry) {
+        entry.collapsed = messageText.classList.contains('collapsed');
+        entry.expanded = !entry.collapsed;
+        conversationView().schedule();
+    }
 }
 
 function toggleCode(codeId) {
     const codeBlock = document.getElementById(codeId);
     const button = codeBlock.nextElementSibling;
+    const entry = entryFor(codeBlock);
 
     if (codeBlock.classList.contains('collapsed')) {
         codeBlock.classList.remove('collapsed');
         button.textContent = 'Show less';
+        entry?.openCode.add(codeId);
     } else {
         codeBlock.classList.add('collapsed');
         button.textContent = 'Show more...';
+        entry?.openCode.delete(codeId);
     }
+    conversationView().schedule();
 }
 
 async function runDiscussion() {
@@ -328,75 +733,53 @@ async function runDiscussion() {
         return;
     }
 
-    clearConversation();
-    const flowDiv = document.getElementById('conversationFlow');
-    flowDiv.innerHTML = '';
+    conversationView().clear();
+    pendingEntries.clear();
 
     try {
         const response = await fetch(`${API_BASE}/api/workflow/discussion-stream`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: sessionHeaders({ 'Content-Type': 'application/json' }),
             body: JSON.stringify({ topic, rounds })
         });
-
-        const reader = response.body.getReader();
-        const decoder = new TextDecoder();
-        let buffer = '';
-
-        while (true) {
-            const { done, value } = await reader.read();
-            if (done) break;
-
-            buffer += decoder.decode(value, { stream: true });
-            const lines = buffer.split('\n');
-            buffer = lines.pop();
-
-            for (const line of lines) {
-                if (line.startsWith('data: ')) {
-                    const data = JSON.parse(line.slice(6));
-                    handleStreamEvent(data);
-                }
-            }
-        }
+        await followRun(response);
     } catch (error) {
         console.error('Error running discussion:', error);
         showError('Failed to run discussion. Check console for details.');
     }
 }
 
-function displayConversation(conversation) {
-    const flowDiv = document.getElementById('conversationFlow');
-    flowDiv.innerHTML = '';
-
-    conversation.forEach((msg, index) => {
-        const agentInfo = agentColors[msg.agent] || agentColors['User'];
-
-        const messageDiv = document.createElement('div');
-        messageDiv.className = 'agent-message';
-        messageDiv.style.animationDelay = `${index * 0.1}s`;
-
-        messageDiv.innerHTML = `
-            <div class="agent-avatar ${agentInfo.class}">
-                ${agentInfo.emoji}
-            </div>
-            <div class="message-content">
-                <div class="message-header">
-                    <span class="agent-name">${msg.agent}</span>
-                    <span class="agent-role">${msg.role || ''}</span>
-                </div>
-                <div class="message-text">${escapeHtml(msg.message)}</div>
-            </div>
-        `;
+function displayConversation(messages) {
+    const view = conversationView();
+    view.clear();
+    pendingEntries.clear();
 
-        flowDiv.appendChild(messageDiv);
+    messages.forEach(msg => {
+        view.add({ kind: 'plain', agent: msg.agent, role: msg.role, text: msg.message, html: escapeHtml(msg.message) });
     });
+}
 
-    flowDiv.scrollIntoView({ behavior: 'smooth', block: 'end' });
+function clearConversation(message = 'Conversation cleared. Starting fresh...') {
+    conversationView().clear(`<div class="empty-state"><p>${message}</p></div>`);
+    pendingEntries.clear();
 }
 
-function clearConversation() {
-    const flowDiv = document.getElementById('conversationFlow');
-    flowDiv.innerHTML = '<div class="empty-state"><p>Conversation cleared. Starting fresh...</p></div>';
+async function cancelRun() {
+    try {
+        const response = await fetch(`${API_BASE}/api/cancel`, {
+            method: 'POST',
+            headers: sessionHeaders()
+        });
+        rememberSession(response);
+
+        const data = await response.json();
+        if (data.success && data.cancelled) {
+            updateAnimationStatus('Stopping...');
+        }
+    } catch (error) {
+        console.error('Error cancelling run:', error);
+        showError('Failed to stop the run');
+    }
 }
 
 async function resetConversation() {
@@ -406,18 +789,15 @@ async function resetConversation() {
 
     try {
         const response = await fetch(`${API_BASE}/api/reset`, {
-            method: 'POST'
+            method: 'POST',
+            headers: sessionHeaders()
         });
+        rememberSession(response);
 
         const data = await response.json();
 
         if (data.success) {
-            clearConversation();
-            document.getElementById('conversationFlow').innerHTML = `
-                <div class="empty-state">
-                    <p>👆 Start a workflow or discussion to see agents collaborate</p>
-                </div>
-            `;
+            clearConversation('👆 Start a workflow or discussion to see agents collaborate');
         }
     } catch (error) {
         console.error('Error resetting conversation:', error);
@@ -431,18 +811,12 @@ function showLoading(show) {
 }
 
 function showError(message) {
-    const flowDiv = document.getElementById('conversationFlow');
-    flowDiv.innerHTML = `
+    pendingEntries.clear();
+    conversationView().clear(`
         <div class="empty-state" style="color: #e74c3c;">
             <p>❌ Error: ${escapeHtml(message)}</p>
         </div>
-    `;
-}
-
-function escapeHtml(text) {
-    const div = document.createElement('div');
-    div.textContent = text;
-    return div.innerHTML;
+    `);
 }
 
 document.addEventListener('keypress', (e) => {
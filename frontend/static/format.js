@@ -0,0 +1,47 @@
+function formatMessage(text) {
+    const escaped = escapeHtml(text);
+
+    // First, handle properly formatted code blocks with triple backticks
+    let formatted = escaped.replace(/```(\w+)?\n([\s\S]*?)```/g, (match, lang, code) => {
+        const codeId = 'code-' + Math.random().toString(36).substr(2, 9);
+        const lines = code.trim().split('\n').length;
+
+        if (lines > 10 || code.length > 500) {
+            return `<pre id="${codeId}" class="collapsed"><code class="language-${lang || ''}">${code}</code></pre>
+                    <button class="code-toggle" onclick="toggleCode('${codeId}')">Show more...</button>`;
+        }
+        return `<pre><code class="language-${lang || ''}">${code}</code></pre>`;
+    });
+
+    // Auto-detect and format code blocks that aren't wrapped in backticks
+    // Look for patterns like: multiple lines with code-like syntax
+    formatted = formatted.replace(/\n((?:(?:[ \t]*(?:function|class|def|import|const|let|var|if|for|while|return|public|private|protected|async|await|export|interface|type)\b[^\n]*\n)|(?:[ \t]*[{}\[\];()][^\n]*\n)|(?:[ \t]+[^\n]+\n)){3,})/g, (match, code) => {
+        // Check if this is already in a code block
+        if (match.includes('<pre>') || match.includes('</pre>')) {
+            return match;
+        }
+
+        const codeId = 'code-' + Math.random().toString(36).substr(2, 9);
+        const lines = code.trim().split('\n').length;
+        const trimmedCode = code.trim();
+
+        // Detect language based on content
+        let lang = '';
+        if (trimmedCode.match(/\b(function|const|let|var|=>|console\.log)\b/)) lang = 'javascript';
+        else if (trimmedCode.match(/\b(def|import|class|print|if __name__)\b/)) lang = 'python';
+        else if (trimmedCode.match(/\b(<html|<div|<body|<script|<style)\b/)) lang = 'html';
+        else if (trimmedCode.match(/\b(public|private|protected|class|interface)\b/)) lang = 'java';
+
+        if (lines > 10 || trimmedCode.length > 500) {
+            return `\n<pre id="${codeId}" class="collapsed"><code class="language-${lang}">${trimmedCode}</code></pre>
+                    <button class="code-toggle" onclick="toggleCode('${codeId}')">Show more...</button>`;
+        }
+        return `\n<pre><code class="language-${lang}">${trimmedCode}</code></pre>`;
+    });
+
+    return formatted;
+}
+
+function escapeHtml(text) {
+    return String(text).replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
+}
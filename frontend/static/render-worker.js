@@ -0,0 +1,6 @@
+importScripts('format.js');
+
+self.onmessage = (event) => {
+    const { id, text } = event.data;
+    self.postMessage({ id, html: formatMessage(text) });
+};
@@ -0,0 +1,14 @@
+import multiprocessing
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 32))
+preload_app = False
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 0))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+accesslog = '-'
+errorlog = '-'